@@ -3,12 +3,7 @@ import json
 from pathlib import Path
 import sys
 import os
-from context6.core.indexer import build_index
-from context6.db.sqlite import init_db, ingest_index
-from context6.core.retrieve import search, get_snippet
-from context6.core.summarize import run_summarize
-from context6.core.present import best_match_entity, pretty_lookup_entity
-from context6.core.eval import evaluate_recall_at_k, load_qrels
+from typing import Callable
 
 
 def _parse_kinds_csv(raw: str | None) -> list[str] | None:
@@ -27,63 +22,52 @@ def _parse_kinds_csv(raw: str | None) -> list[str] | None:
 
 
 def _print_json(data: object) -> None:
-    print(json.dumps(data, indent=2, ensure_ascii=False))
-
-
-def main():
-    p = argparse.ArgumentParser(description="Context6: A code search and navigation tool")
-    sub = p.add_subparsers(dest="cmd", required=True)
-    p_index = sub.add_parser("index", help="Build an index and load into the database")
-    p_index.add_argument("--source", type=Path, help="Source code directory to index")
-    p_index.add_argument("--out", type=Path, default=Path.home()/"code/context6/arc", help="Output directory")
-    p_index.add_argument("--db", type=Path, default=None, help="Path to the database (overrides --out)")
-
-    p_lookup = sub.add_parser("lookup", help="Lookup a symbol by name")
-    p_lookup.add_argument("--db", type=Path, required=True, help="Path to the database")
-    p_lookup.add_argument("name", type=str, help="Name of the symbol to lookup")
-    p_lookup.add_argument("--source", type=Path, default=None, help="Path to ARC repo root (or set CONTEXT6_SOURCE_ROOT)")
-    p_lookup.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
-    p_lookup.add_argument("--summarizer", choices=["auto", "ollama", "codex"], default="auto")
-    p_lookup.add_argument("--codex-bin", type=str, default=os.environ.get("CONTEXT6_CODEX_BIN", "codex"))
-
-
-    p_search = sub.add_parser("search", help="Search by text query")
-    p_search.add_argument("--db", type=Path, required=True, help="Path to the database")
-    p_search.add_argument("query", type=str, help="Text query to search for")
-    p_search.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
-
-    p_snip = sub.add_parser("snippet", help="Show code snippet for fqname")
-    p_snip.add_argument("--db", type=Path, required=True, help="Path to the database")
-    p_snip.add_argument("fqname", type=str, help="Fully qualified name of the symbol")
-
-    p_sum = sub.add_parser("summarize", help="Generate summaries")
-    p_sum.add_argument("--db", type=Path, required=True)
-    p_sum.add_argument("--limit", type=int, default=200)
-    p_sum.add_argument("--summarizer", choices=["auto", "ollama", "codex"], default="auto")
-    p_sum.add_argument("--codex-bin", type=str, default=os.environ.get("CONTEXT6_CODEX_BIN", "codex"))
-
-    p_eval = sub.add_parser("eval-recall", help="Evaluate retrieval recall@k from qrels")
-    p_eval.add_argument("--db", type=Path, required=True, help="Path to the database")
-    p_eval.add_argument("--qrels", type=Path, required=True, help="Path to qrels .json or .jsonl file")
-    p_eval.add_argument("--k", type=int, default=10, help="Top-k cutoff")
-    p_eval.add_argument("--retriever", choices=["search", "lookup"], default="search")
-    p_eval.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
-
-    args = p.parse_args()
-
-    if args.cmd == "index":
+    try:
+        import orjson  # optional speedup; same indent=2, non-ASCII-preserving output
+    except ImportError:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+        return
+    print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8"))
+
+
+# Each subcommand is a (help, builder) pair. A builder adds the subcommand's
+# arguments to a parser and returns its handler; handlers import their heavy
+# modules lazily so only the selected command pays for its imports.
+
+def _build_index_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--source", type=Path, help="Source code directory to index")
+    p.add_argument("--out", type=Path, default=Path.home()/"code/context6/arc", help="Output directory")
+    p.add_argument("--db", type=Path, default=None, help="Path to the database (overrides --out)")
+    p.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count; 1 = no pool)")
+    p.add_argument("--no-cache", action="store_true", help="Reparse every file instead of reusing unchanged ones")
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.indexer import build_index
+        from context6.db.sqlite import init_db, ingest_index
+
         print(f"Indexing source code in {args.source}...")
         out = args.out
         out.mkdir(parents=True, exist_ok=True)
         db_path = args.db or (out / "context6.db")
         init_db(db_path)
-        idx = build_index(args.source)
+        idx = build_index(args.source, workers=args.workers, cache_db=None if args.no_cache else db_path)
         ingest_index(db_path, idx)
         print(f"Index {len(idx)} symbols built.")
         print(f"Indexing complete. Database saved to {db_path}")
 
-    elif args.cmd == "lookup":
+    return run
+
 
+def _build_lookup_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--db", type=Path, required=True, help="Path to the database")
+    p.add_argument("name", type=str, help="Name of the symbol to lookup")
+    p.add_argument("--source", type=Path, default=None, help="Path to ARC repo root (or set CONTEXT6_SOURCE_ROOT)")
+    p.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
+    p.add_argument("--summarizer", choices=["auto", "ollama", "codex"], default="auto")
+    p.add_argument("--codex-bin", type=str, default=os.environ.get("CONTEXT6_CODEX_BIN", "codex"))
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.present import best_match_entity, pretty_lookup_entity
 
         source = args.source or Path(os.environ.get("CONTEXT6_SOURCE_ROOT", ""))
         if not source or not source.exists():
@@ -97,8 +81,17 @@ def main():
             return
         print(pretty_lookup_entity(args.db, source, e))
 
+    return run
+
+
+def _build_search_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--db", type=Path, required=True, help="Path to the database")
+    p.add_argument("query", type=str, help="Text query to search for")
+    p.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.retrieve import search
 
-    elif args.cmd == "search":
         try:
             res = search(args.db, args.query, kinds=_parse_kinds_csv(args.kinds))
         except Exception as e:
@@ -106,19 +99,51 @@ def main():
             raise SystemExit(2)
         _print_json(res)
 
-    elif args.cmd == "snippet":
+    return run
+
+
+def _build_snippet_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--db", type=Path, required=True, help="Path to the database")
+    p.add_argument("fqname", type=str, help="Fully qualified name of the symbol")
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.retrieve import get_snippet
+
         try:
             res = get_snippet(args.db, args.fqname)
         except Exception as e:
             print(str(e), file=sys.stderr)
             raise SystemExit(2)
         _print_json(res)
-    
-    elif args.cmd == "summarize":
+
+    return run
+
+
+def _build_summarize_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--db", type=Path, required=True)
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--summarizer", choices=["auto", "ollama", "codex"], default="auto")
+    p.add_argument("--codex-bin", type=str, default=os.environ.get("CONTEXT6_CODEX_BIN", "codex"))
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.summarize import run_summarize
+
         n = run_summarize(args.db, limit=args.limit, summarizer=args.summarizer, codex_bin=args.codex_bin)
         print(f"Summarized {n} entities")
 
-    elif args.cmd == "eval-recall":
+    return run
+
+
+def _build_eval_recall_parser(p: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+    p.add_argument("--db", type=Path, required=True, help="Path to the database")
+    p.add_argument("--qrels", type=Path, required=True, help="Path to qrels .json or .jsonl file")
+    p.add_argument("--k", type=int, default=10, help="Top-k cutoff")
+    p.add_argument("--retriever", choices=["search", "lookup"], default="search")
+    p.add_argument("--kinds", type=str, default="class", help="Comma-separated kinds filter (default: class)")
+
+    def run(args: argparse.Namespace) -> None:
+        from context6.core.eval import evaluate_recall_at_k, load_qrels
+
         qrels = load_qrels(args.qrels)
         out = evaluate_recall_at_k(
             args.db,
@@ -129,6 +154,47 @@ def main():
         )
         _print_json(out)
 
+    return run
+
+
+COMMANDS: dict[str, tuple[str, Callable[[argparse.ArgumentParser], Callable[[argparse.Namespace], None]]]] = {
+    "index": ("Build an index and load into the database", _build_index_parser),
+    "lookup": ("Lookup a symbol by name", _build_lookup_parser),
+    "search": ("Search by text query", _build_search_parser),
+    "snippet": ("Show code snippet for fqname", _build_snippet_parser),
+    "summarize": ("Generate summaries", _build_summarize_parser),
+    "eval-recall": ("Evaluate retrieval recall@k from qrels", _build_eval_recall_parser),
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point for the context6 CLI. Only the selected subcommand's parser is built
+    and only its handler's modules are imported.
+
+    :param argv: Command-line arguments (defaults to sys.argv[1:])
+    :type argv: list[str] | None
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    description = "Context6: A code search and navigation tool"
+
+    if not argv or argv[0] not in COMMANDS:
+        # Top-level help / usage errors: list subcommands without building their arguments.
+        p = argparse.ArgumentParser(description=description)
+        sub = p.add_subparsers(dest="cmd", required=True)
+        for name, (help_text, _) in COMMANDS.items():
+            sub.add_parser(name, help=help_text)
+        p.parse_args(argv)
+        return
+
+    cmd = argv[0]
+    help_text, builder = COMMANDS[cmd]
+    p = argparse.ArgumentParser(prog=f"{Path(sys.argv[0]).name} {cmd}", description=help_text)
+    handler = builder(p)
+    args = p.parse_args(argv[1:])
+    args.cmd = cmd
+    handler(args)
+
 
 if __name__ == "__main__":
     main()
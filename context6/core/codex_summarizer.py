@@ -11,6 +11,7 @@ Returns the result as a dict shaped
 """
 from __future__ import annotations
 
+import functools
 import os
 import shutil
 import subprocess
@@ -18,10 +19,15 @@ import tempfile
 from pathlib import Path
 from typing import Any
 
+# Below this size (with no docstring) spawning codex costs more than it tells us
+TINY_CODE_CHARS = 200
 
+
+@functools.lru_cache(maxsize=8)
 def _require_codex(codex_bin: str) -> str:
     """
     Ensure the Codex binary is available and return its path.
+    Successful lookups are cached; a missing binary is re-checked on the next call.
     
     :param codex_bin: Name or path of the Codex binary
     :type codex_bin: str
@@ -38,6 +44,8 @@ def _require_codex(codex_bin: str) -> str:
 def summmarize_entity_codex(kind: str, fqname: str, signature: str, docstring: str, code: str, codex_bin: str = "codex", timeout_s: int = 180) -> dict[str, Any]:
     """
     Summarize a code entity using the Codex binary.
+    Tiny undocumented entities (< TINY_CODE_CHARS of code) get a signature-only summary with coverage "partial"
+    without invoking codex; it is stored like any other summary and can be told apart (or redone) by that coverage.
 
     :param kind: The kind of the entity (e.g., "class", "function")
     :type kind: str
@@ -57,6 +65,14 @@ def summmarize_entity_codex(kind: str, fqname: str, signature: str, docstring: s
     :rtype: dict[str, Any]
     """
 
+    if len(code) < TINY_CODE_CHARS and not docstring:
+        return {
+            "summary": f"Purpose: {signature or fqname}\nCoverage: partial",
+            "was_truncated": False,
+            "approx_tokens": len(code) // 4,
+            "coverage": "partial",
+        }
+
     codex_bin = _require_codex(codex_bin)
 
     template = (
@@ -74,17 +90,15 @@ def summmarize_entity_codex(kind: str, fqname: str, signature: str, docstring: s
         "Coverage should be 'full' if the file content is complete.\n"
     )
 
-    payload_text = (
-        f"ENTITY\nkind: {kind}\n"
-        f"fqname: {fqname}\n"
-        f"signature: {signature}\n\n"
-        f"DOCSTRING (may be empty)\n{docstring}\n\n"
-        f"CODE\n{code}\n"
-    )
+    payload_text = "".join([
+        f"ENTITY\nkind: {kind}\nfqname: {fqname}\nsignature: {signature}\n\n",
+        f"DOCSTRING (may be empty)\n{docstring}\n\n",
+        "CODE\n", code, "\n",
+    ])
 
     with tempfile.TemporaryDirectory(prefix="context6_codex_") as td:
         p = Path(td) / "entity.txt"
-        p.write_text(payload_text, encoding="utf-8", errors="replace")
+        p.write_bytes(payload_text.encode("utf-8", "replace"))
 
         prompt = (
             f"Read the file at: {p.as_posix()}\n\n"
@@ -5,7 +5,14 @@ import sqlite3
 from pathlib import Path
 from typing import Any
 
-from context6.core.retrieve import lookup_symbol, search
+from context6.core.retrieve import _open_readonly, lookup_symbol, search
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # optional speedup
+    _json_loads = json.loads
 
 
 def _normalize_qrels_item(item: dict[str, Any]) -> dict[str, Any]:
@@ -45,35 +52,36 @@ def _normalize_qrels_item(item: dict[str, Any]) -> dict[str, Any]:
     return out
 
 
-def _fetch_entity_kinds(db: Path, fqnames: set[str]) -> dict[str, str]:
+def _fetch_entity_kinds(con: sqlite3.Connection, fqnames: set[str]) -> dict[str, str]:
     if not fqnames:
         return {}
-    con = sqlite3.connect(str(db))
-    try:
-        placeholders = ",".join(["?"] * len(fqnames))
-        rows = con.execute(
-            f"SELECT fqname, kind FROM entities WHERE fqname IN ({placeholders})",
-            tuple(sorted(fqnames)),
-        ).fetchall()
-        return {str(r[0]): str(r[1]) for r in rows}
-    finally:
-        con.close()
+    # One JSON-array parameter instead of an IN (?, ?, ...) list per call; read-only, unlike a temp table
+    rows = con.execute(
+        "SELECT fqname, kind FROM entities WHERE fqname IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted(fqnames)),),
+    ).fetchall()
+    return {str(r[0]): str(r[1]) for r in rows}
+
+
+def _connect_eval(db: Path) -> sqlite3.Connection:
+    # One read-only connection for the whole evaluation, shared with the retrievers
+    return _open_readonly(db)
 
 
 def load_qrels(path: Path) -> list[dict[str, Any]]:
-    text = path.read_text(encoding="utf-8")
     if path.suffix.lower() == ".jsonl":
         rows: list[dict[str, Any]] = []
-        for raw in text.splitlines():
-            line = raw.strip()
-            if not line:
-                continue
-            rows.append(_normalize_qrels_item(json.loads(line)))
+        with path.open("r", encoding="utf-8") as f:
+            for raw in f:
+                line = raw.strip()
+                if not line:
+                    continue
+                rows.append(_normalize_qrels_item(_json_loads(line)))
         if not rows:
             raise ValueError(f"No qrels rows found in {path}")
         return rows
 
-    data = json.loads(text)
+    data = _json_loads(path.read_bytes())
     if not isinstance(data, list):
         raise ValueError("JSON qrels file must be a list of objects.")
     rows = [_normalize_qrels_item(x) for x in data]
@@ -99,64 +107,77 @@ def evaluate_recall_at_k(
     recall_sum = 0.0
     hit_sum = 0.0
 
+    items = [_normalize_qrels_item(row) for row in qrels]
     all_relevant = set()
-    for row in qrels:
-        item = _normalize_qrels_item(row)
+    for item in items:
         all_relevant.update(item["relevant"])
-    db_kinds = _fetch_entity_kinds(db, all_relevant)
-
-    for row in qrels:
-        item = _normalize_qrels_item(row)
-        query = item["query"]
-        relevant = set(item["relevant"])
-        explicit_kinds = item.get("relevant_kinds") or {}
-        relevant_kind_map = {fq: explicit_kinds.get(fq) or db_kinds.get(fq) for fq in relevant}
-
-        excluded_relevant = []
-        eligible_relevant: set[str] = set(relevant)
-        if kinds:
-            allowed = set(kinds)
-            eligible_relevant = set()
-            for fq in sorted(relevant):
-                knd = relevant_kind_map.get(fq)
-                if knd in allowed:
-                    eligible_relevant.add(fq)
-                    continue
-                excluded_relevant.append({"fqname": fq, "kind": knd or "unknown"})
-            if excluded_relevant:
-                warnings.append(
-                    f"Query '{query}': {len(excluded_relevant)}/{len(relevant)} relevant targets are excluded by kinds filter {list(kinds)}."
-                )
-
-        if retriever == "search":
-            out = search(db, query, limit=k, kinds=kinds)
-            returned = [r["fqname"] for r in out["results"][:k]]
-        else:
-            out = lookup_symbol(db, query, limit=k, kinds=kinds)
-            returned = [r["fqname"] for r in out["matches"][:k]]
-
-        returned_set = set(returned)
-        eligible_matched = sorted(eligible_relevant.intersection(returned_set))
-        eligible_relevant_count = len(eligible_relevant)
-        recall = (len(eligible_matched) / eligible_relevant_count) if eligible_relevant_count else 0.0
-        hit = 1.0 if eligible_matched else 0.0
-
-        recall_sum += recall
-        hit_sum += hit
-        details.append(
-            {
-                "query": query,
-                "relevant_count": len(relevant),
-                "eligible_relevant_count": eligible_relevant_count,
-                "retrieved_count": len(returned),
-                "matched_count": len(eligible_matched),
-                "eligible_matched_count": len(eligible_matched),
-                "recall_at_k": recall,
-                "hit_at_k": hit,
-                "matched_fqnames": eligible_matched,
-                "excluded_relevant_by_kinds": excluded_relevant,
-            }
-        )
+    con = _connect_eval(db)
+    try:
+        db_kinds = _fetch_entity_kinds(con, all_relevant)
+
+        # Repeated queries hit the same retriever with the same arguments
+        retrieval_cache: dict[tuple[str, int, tuple[str, ...]], list[str]] = {}
+        allowed = set(kinds) if kinds else None
+        kinds_key = tuple(kinds or ())
+
+        for item in items:
+            query = item["query"]
+            relevant = set(item["relevant"])
+            explicit_kinds = item.get("relevant_kinds") or {}
+            relevant_kind_map = {fq: explicit_kinds.get(fq) or db_kinds.get(fq) for fq in relevant}
+
+            excluded_relevant = []
+            eligible_relevant: set[str] = set(relevant)
+            if allowed is not None:
+                eligible_relevant = set()
+                for fq in relevant:
+                    knd = relevant_kind_map.get(fq)
+                    if knd in allowed:
+                        eligible_relevant.add(fq)
+                        continue
+                    excluded_relevant.append({"fqname": fq, "kind": knd or "unknown"})
+                if excluded_relevant:
+                    # Only the (usually short) excluded list needs a stable order for output
+                    excluded_relevant.sort(key=lambda x: x["fqname"])
+                    warnings.append(
+                        f"Query '{query}': {len(excluded_relevant)}/{len(relevant)} relevant targets are excluded by kinds filter {list(kinds)}."
+                    )
+
+            cache_key = (query, k, kinds_key)
+            returned = retrieval_cache.get(cache_key)
+            if returned is None:
+                if retriever == "search":
+                    out = search(db, query, limit=k, kinds=kinds, con=con)
+                    returned = [r["fqname"] for r in out["results"][:k]]
+                else:
+                    out = lookup_symbol(db, query, limit=k, kinds=kinds, con=con)
+                    returned = [r["fqname"] for r in out["matches"][:k]]
+                retrieval_cache[cache_key] = returned
+
+            returned_set = set(returned)
+            eligible_matched = sorted(eligible_relevant.intersection(returned_set))
+            eligible_relevant_count = len(eligible_relevant)
+            recall = (len(eligible_matched) / eligible_relevant_count) if eligible_relevant_count else 0.0
+            hit = 1.0 if eligible_matched else 0.0
+
+            recall_sum += recall
+            hit_sum += hit
+            details.append(
+                {
+                    "query": query,
+                    "relevant_count": len(relevant),
+                    "eligible_relevant_count": eligible_relevant_count,
+                    "retrieved_count": len(returned),
+                    "matched_count": len(eligible_matched),
+                    "eligible_matched_count": len(eligible_matched),
+                    "recall_at_k": recall,
+                    "hit_at_k": hit,
+                    "matched_fqnames": eligible_matched,
+                    "excluded_relevant_by_kinds": excluded_relevant,
+                }
+            )
+    finally:
+        con.close()
 
     n = len(details)
     return {
@@ -1,9 +1,47 @@
 from __future__ import annotations
 import ast
 import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, asdict
+from itertools import repeat
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+_MIN_FILES_FOR_POOL = 64
+_MAX_SOURCE_CHARS = 2_000_000
+_SKIP_DIRS = frozenset({"venv", "env", "__pycache__", "build"})  # plus any hidden (dot) dir
+# AST fields that hold statements (or except/case clauses, which hold statements in turn)
+_STMT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+# Bump whenever _index_one's output changes, so ast_cache rows from older versions are ignored
+_AST_CACHE_VERSION = 2
+
+
+@dataclass(slots=True, frozen=True)
+class Entity:
+    """
+    An indexed symbol (module, class, function or method).
+    Slotted to keep large indexes compact; also readable like the dict rows it replaced
+    (``e["fqname"]``, ``e.get("docstring", "")``) so existing consumers keep working.
+    """
+    kind: str
+    fqname: str
+    file: str
+    start_line: int
+    end_line: int
+    signature: str
+    docstring: str
+    code_hash: str
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
 
 
 def _read(p: Path) -> str:
@@ -20,14 +58,27 @@ def _read(p: Path) -> str:
 
 def _hash(s: str) -> str:
     """
-    Hash a string using SHA-256.
+    Hash a string for change detection using BLAKE2b (128-bit digest).
+    Not used for security, so a fast stdlib hash is enough.
 
     :param s: String to hash
     :type s: str
     :return: Hexadecimal hash of the string
     :rtype: str
     """
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+    return _hash_bytes(s.encode("utf-8"))
+
+
+def _hash_bytes(b: bytes) -> str:
+    """
+    Hash already-encoded bytes with the same BLAKE2b digest as :func:`_hash`.
+
+    :param b: Bytes to hash
+    :type b: bytes
+    :return: Hexadecimal hash of the bytes
+    :rtype: str
+    """
+    return hashlib.blake2b(b, digest_size=16).hexdigest()
 
 
 def _signature(node: ast.FunctionDef | ast.AsyncFunctionDef) -> str:
@@ -62,114 +113,262 @@ def _get_doc(node: ast.AST) -> str:
     """
     return ast.get_docstring(node) or ""
 
-def build_index(root: Path) -> dict[str, Any]:
+
+class _ModuleVisitor(ast.NodeVisitor):
+    """
+    Collect classes, methods, functions and imports of a module in a single AST pass.
+
+    Only classes/functions directly in the module body (and methods directly on those classes)
+    become entities; definitions under a module-level if/try/with/... do not. Imports are collected
+    at any depth. Definitions and imports are statements, so the walk follows statement bodies
+    only and never descends into expressions.
+    """
+
+    def __init__(self, mod_name: str, rel: str, src_bytes: bytes) -> None:
+        self.mod_name = mod_name
+        self.rel = rel
+        # Split once so each entity's source segment is a slice instead of a re-split of
+        # the whole file. bytes.splitlines breaks on \n, \r and \r\n only, like ast does.
+        self.src_lines = src_bytes.splitlines(keepends=True)
+        self.entities: list[Entity] = []
+        self.relations: list[dict[str, Any]] = []
+        self.imports: list[dict[str, Any]] = []
+        self._depth = 0  # enclosing classes/functions
+        self._compound = 0  # enclosing compound statements (if, try, with, for, ...)
+
+    def _entity(self, kind: str, fq: str, node: ast.AST, signature: str, default_start: int = 1) -> None:
+        start = getattr(node, "lineno", default_start)
+        end = getattr(node, "end_lineno", start)
+        self.entities.append(Entity(
+            kind=kind,
+            fqname=fq,
+            file=self.rel,
+            start_line=start,
+            end_line=end,
+            signature=signature,
+            docstring=_get_doc(node),
+            code_hash=_hash_bytes(self._segment(node)),
+        ))
+        self.relations.append({
+            "src": self.mod_name,
+            "rel": "defines",
+            "dst": fq,
+        })
+
+    def _segment(self, node: ast.AST) -> bytes:
+        """
+        UTF-8 bytes of ``ast.get_source_segment(src, node) or ""``, sliced from the precomputed lines.
+
+        :param node: AST node with position information
+        :type node: ast.AST
+        :return: Source bytes of the node, or empty bytes if positions are missing
+        :rtype: bytes
+        """
+        end_lineno = getattr(node, "end_lineno", None)
+        end_col = getattr(node, "end_col_offset", None)
+        if end_lineno is None or end_col is None:
+            return b""
+        lineno = node.lineno - 1
+        end_lineno -= 1
+        col = node.col_offset
+        # Column offsets are UTF-8 byte offsets, so they index the byte lines directly
+        lines = self.src_lines
+        if lineno == end_lineno:
+            return lines[lineno][col:end_col]
+        return b"".join([lines[lineno][col:], *lines[lineno + 1 : end_lineno], lines[end_lineno][:end_col]])
+
+    def _visit_body(self, node: ast.AST) -> None:
+        for field in _STMT_FIELDS:
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+    visit_Module = _visit_body
+
+    def generic_visit(self, node: ast.AST) -> None:
+        self._compound += 1
+        self._visit_body(node)
+        self._compound -= 1
+
+    def _visit_nested(self, node: ast.AST) -> None:
+        self._depth += 1
+        self._visit_body(node)
+        self._depth -= 1
+
+    def _top_level(self) -> bool:
+        return self._depth == 0 and self._compound == 0
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        if self._top_level():
+            fq = f"{self.mod_name}.{node.name}"
+            self._entity("class", fq, node, f"class {node.name}")
+
+            # Handle methods
+            for sub in node.body:
+                if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    self._entity("method", f"{fq}.{sub.name}", sub, _signature(sub),
+                                 default_start=getattr(node, "lineno", 1))
+        self._visit_nested(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        if self._top_level():
+            self._entity("function", f"{self.mod_name}.{node.name}", node, _signature(node))
+        self._visit_nested(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.imports.append({"src": self.mod_name, "rel": "imports", "dst": alias.name})
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module:
+            self.imports.append({"src": self.mod_name, "rel": "imports", "dst": node.module})
+
+
+def _index_one(root_str: str, rel: str) -> tuple[list[Entity], list[dict[str, Any]]]:
+    """
+    Index a single Python file. Top-level so it can run in a worker process.
+
+    :param root_str: Resolved source root directory
+    :type root_str: str
+    :param rel: POSIX path of the file relative to the root
+    :type rel: str
+    :return: Entities and relations for the file (both empty if it is too large or does not parse)
+    :rtype: tuple[list[Entity], list[dict[str, Any]]]
+    """
+    src = _read(Path(root_str) / rel)
+    if len(src) > _MAX_SOURCE_CHARS:
+        # Generated/minified blobs: slow to parse, useless to index
+        return [], []
+    try:
+        tree = compile(src, rel, "exec", flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+    except (SyntaxError, ValueError):  # ValueError: null bytes on older Pythons
+        return [], []
+
+    mod_name = rel[:-3].replace("/", ".") # path -> module-ish
+    mod_doc = _get_doc(tree)
+    src_bytes = src.encode("utf-8")
+    mod_hash = _hash_bytes(src_bytes)
+    visitor = _ModuleVisitor(mod_name, rel, src_bytes)
+
+    # Module entity
+    entities: list[Entity] = [Entity(
+        kind="module",
+        fqname=mod_name,
+        file=rel,
+        start_line=1,
+        end_line=len(visitor.src_lines),
+        signature="",
+        docstring=mod_doc,
+        code_hash=mod_hash,
+    )]
+
+    visitor.visit(tree)
+    entities.extend(visitor.entities)
+    return entities, visitor.relations + visitor.imports
+
+
+def _index_files(root_str: str, rel_paths: list[str], workers: int | None) -> Iterator[tuple[list[Entity], list[dict[str, Any]]]]:
+    """
+    Index files in order, in parallel worker processes unless there are too few to pay for a pool.
+
+    :param root_str: Resolved source root directory
+    :type root_str: str
+    :param rel_paths: POSIX paths of the files relative to the root
+    :type rel_paths: list[str]
+    :param workers: Number of worker processes (None = CPU count, 1 = no pool)
+    :type workers: int | None
+    :return: Iterator of (entities, relations) per file, in rel_paths order
+    :rtype: Iterator[tuple[list[Entity], list[dict[str, Any]]]]
+    """
+    # Pool start-up costs more than parsing a handful of files
+    if workers == 1 or len(rel_paths) < _MIN_FILES_FOR_POOL:
+        yield from map(_index_one, repeat(root_str), rel_paths)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            yield from ex.map(_index_one, repeat(root_str), rel_paths, chunksize=32)
+
+
+def build_index(root: Path, workers: int | None = None, cache_db: Path | None = None) -> dict[str, Any]:
     """
     Build an index of symbols from the source code in the given directory.
+    Files are parsed in parallel worker processes; results keep file discovery order.
 
     :param root: Path to the source code directory
     :type root: Path
+    :param workers: Number of worker processes (None = CPU count, 1 = no pool)
+    :type workers: int | None
+    :param cache_db: Optional initialized context6 database whose ast_cache table keeps each file's
+                     parse result; files whose mtime and size are unchanged are not parsed again
+    :type cache_db: Path | None
     :return: Dictionary mapping symbol names to their metadata
     :rtype: dict[str, Any]
     """
     root = root.resolve()
-    entities: list[dict[str, Any]] = []
+    entities: list[Entity] = []
     relations: list[dict[str, Any]] = []
 
-    for p in root.rglob("*.py"):
-        if any(part in {"venv", "env", "__pycache__", ".mypy_cache", ".pytest_cache", ".git", ".idea", ".", "build"} for part in p.parts):
-            continue
-        rel = p.relative_to(root).as_posix()
-        src = _read(p)
-        try:
-            tree = ast.parse(src)
-        except SyntaxError:
-            continue
-
-        mod_name = rel[:-3].replace("/", ".") # path -> module-ish
-        mod_doc = _get_doc(tree)
-        mod_hash = _hash(src)
-
-        # Module entity
-        entities.append({
-            "kind": "module",
-            "fqname": mod_name,
-            "file": rel,
-            "start_line": 1,
-            "end_line": len(src.splitlines()),
-            "signature": "",
-            "docstring": mod_doc,
-            "code_hash": mod_hash,
-        })
+    rel_paths: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Prune in place so skipped trees (venv, .git, ...) are never descended into
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS and not d.startswith("."))
+        rel_dir = Path(dirpath).relative_to(root)
+        for fn in sorted(filenames):
+            if fn.endswith(".py"):
+                rel_paths.append((rel_dir / fn).as_posix())
 
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef):
-                start = getattr(node, "lineno", 1)
-                end = getattr(node, "end_lineno", start)
-                fq = f"{mod_name}.{node.name}"
-                entities.append({
-                    "kind": "class",
-                    "fqname": fq,
-                    "file": rel,
-                    "start_line": start,
-                    "end_line": end,
-                    "signature": f"class {node.name}",
-                    "docstring": _get_doc(node),
-                    "code_hash": _hash(ast.get_source_segment(src, node) or ""),
-                })
-                relations.append({
-                    "src": mod_name,
-                    "rel": "defines",
-                    "dst": fq,
-                })
-
-                # Handle methods
-                for sub in node.body:
-                    if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        s2tart = getattr(sub, "lineno", start)
-                        e2nd = getattr(sub, "end_lineno", s2tart)
-                        fq2 = f"{fq}.{sub.name}"
-                        entities.append({
-                            "kind": "method",
-                            "fqname": fq2,
-                            "file": rel,
-                            "start_line": s2tart,
-                            "end_line": e2nd,
-                            "signature": _signature(sub),
-                            "docstring": _get_doc(sub),
-                            "code_hash": _hash(ast.get_source_segment(src, sub) or ""),
-                        })
-                        relations.append({
-                            "src": mod_name,
-                            "rel": "defines",
-                            "dst": fq2,
-                        })
-            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                start = getattr(node, "lineno", 1)
-                end = getattr(node, "end_lineno", start)
-                fq = f"{mod_name}.{node.name}"
-                entities.append({
-                    "kind": "function",
-                    "fqname": fq,
-                    "file": rel,
-                    "start_line": start,
-                    "end_line": end,
-                    "signature": _signature(node),
-                    "docstring": _get_doc(node),
-                    "code_hash": _hash(ast.get_source_segment(src, node) or ""),
-                })
-                relations.append({
-                    "src": mod_name,
-                    "rel": "defines",
-                    "dst": fq,
-                })
-
-        # Imports (simple)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    relations.append({"src": mod_name, "rel": "imports", "dst": alias.name})
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    relations.append({"src": mod_name, "rel": "imports", "dst": node.module})
+    if cache_db is None:
+        per_file = _index_files(str(root), rel_paths, workers)
+    else:
+        per_file = _index_files_cached(root, rel_paths, workers, cache_db)
+    for ents, rels in per_file:
+        entities.extend(ents)
+        relations.extend(rels)
 
     return {"root": str(root), "entities": entities, "relations": relations}
+
+
+def _index_files_cached(
+    root: Path,
+    rel_paths: list[str],
+    workers: int | None,
+    cache_db: Path,
+) -> list[tuple[list[Entity], list[dict[str, Any]]]]:
+    """
+    Like :func:`_index_files`, but reuse the cached result of every file whose (mtime_ns, size)
+    match the ast_cache row, parse only the rest, and store their results back.
+
+    :param root: Resolved source root directory
+    :type root: Path
+    :param rel_paths: POSIX paths of the files relative to the root
+    :type rel_paths: list[str]
+    :param workers: Number of worker processes for the files that need parsing
+    :type workers: int | None
+    :param cache_db: Initialized context6 database holding the ast_cache table
+    :type cache_db: Path
+    :return: (entities, relations) per file, in rel_paths order
+    :rtype: list[tuple[list[Entity], list[dict[str, Any]]]]
+    """
+    from context6.db.sqlite import load_ast_cache, update_ast_cache
+
+    cached = load_ast_cache(cache_db, str(root))
+    results: list[Any] = [None] * len(rel_paths)
+    misses: list[tuple[int, str, int, int]] = []
+    for i, rel in enumerate(rel_paths):
+        st = os.stat(root / rel)
+        hit = cached.get(rel)
+        if hit is not None and hit[:3] == (st.st_mtime_ns, st.st_size, _AST_CACHE_VERSION):
+            results[i] = pickle.loads(hit[3])
+        else:
+            # Stat before parsing: if the file changes in between, the stored mtime is stale
+            # and the next run simply parses it again
+            misses.append((i, rel, st.st_mtime_ns, st.st_size))
+
+    fresh = []
+    parsed = _index_files(str(root), [rel for _, rel, _, _ in misses], workers)
+    for (i, rel, mtime_ns, size), result in zip(misses, parsed):
+        results[i] = result
+        fresh.append((rel, mtime_ns, size, _AST_CACHE_VERSION, pickle.dumps(result, pickle.HIGHEST_PROTOCOL)))
+
+    update_ast_cache(cache_db, str(root), fresh, rel_paths)
+    return results
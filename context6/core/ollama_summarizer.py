@@ -1,8 +1,20 @@
 from __future__ import annotations
 import os
 import json
+import sys
 import urllib.request
-from typing import Any, Dict
+from typing import Any, Callable, Dict
+
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # optional speedup
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
 
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 MODEL = os.environ.get("CONTEXT6_MODEL", "qwen2.5:7b")
@@ -27,7 +39,7 @@ def _post_json(url: str, payload: Dict[str, Any], timeout: int = 120) -> dict[st
     :return: The JSON response as a dictionary
     :rtype: dict[str, Any]
     """
-    data = json.dumps(payload).encode("utf-8")
+    data = _json_dumps(payload)
     req = urllib.request.Request(
         url,
         data=data,
@@ -35,7 +47,7 @@ def _post_json(url: str, payload: Dict[str, Any], timeout: int = 120) -> dict[st
         method="POST",
     )
     with urllib.request.urlopen(req, timeout=timeout) as res:
-        return json.loads(res.read().decode("utf-8"))
+        return _json_loads(res.read())
 
 def _post_json_stream(url: str, payload: Dict[str, Any], timeout: int = 120) -> str:
     """
@@ -50,23 +62,96 @@ def _post_json_stream(url: str, payload: Dict[str, Any], timeout: int = 120) ->
     :return: The streamed JSON response as a string
     :rtype: str
     """
-    data = json.dumps(payload).encode("utf-8")
+    data = _json_dumps(payload)
     req = urllib.request.Request(url, data=data, headers={"Content-Type":"application/json"}, method="POST")
-    out_parts = []
+    buf = bytearray()
     with urllib.request.urlopen(req, timeout=timeout) as resp:
-        for raw in resp:
-            obj = json.loads(raw.decode("utf-8"))
+        for i, raw in enumerate(resp):
+            obj = _json_loads(raw)
             if "response" in obj:
-                out_parts.append(obj["response"])
-                # tiny heartbeat
-                print(".", end="", flush=True)
+                buf += obj["response"].encode("utf-8")
+                # tiny heartbeat, one write per 32 chunks
+                if (i & 31) == 0:
+                    sys.stderr.write(".")
+                    sys.stderr.flush()
             if obj.get("done"):
                 break
-    print("")  # newline after dots
-    return "".join(out_parts).strip()
+    sys.stderr.write("\n")  # newline after dots
+    return buf.decode("utf-8").strip()
+
+
+_SYSTEM_PROMPT = (
+    "You are summarizing Python code for a local developer knowledge base.\n"
+    "Rules:\n"
+    "- Be factual; if unclear, write 'unclear'.\n"
+    "- No speculation.\n"
+    "- Keep it compact.\n"
+    "- Output MUST be at most 12 lines.\n"
+)
+
+_SUMMARY_TEMPLATE = (
+    "Produce a 12-lines-or-less structured summary with these headings:\n"
+    "1) Purpose:\n"
+    "2) Responsibilities:\n"
+    "3) Inputs/Outputs:\n"
+    "4) Side effects:\n"
+    "5) Error modes:\n"
+    "6) Key methods/flows:\n"
+    "7) Extension points:\n"
+    "8) Related concepts:\n"
+    "(Skip headings that are not applicable, but still stay <=12 lines.)\n"
+    "Last line MUST be: Coverage: full|partial|unclear\n"
+)
+
+
+def _max_code_chars(header: str, doc_block: str) -> int:
+    """
+    How many characters of code fit in the prompt next to the given header and docstring block.
+
+    :param header: The ENTITY block of the prompt
+    :type header: str
+    :param doc_block: The DOCSTRING block of the prompt
+    :type doc_block: str
+    :return: Maximum number of code characters sent to Ollama
+    :rtype: int
+    """
+    # Size of the prompt without code, summed from its pieces rather than built
+    overhead_chars = len(_SYSTEM_PROMPT) + 2 + len(header) + len(doc_block) + len("CODE\n\n") + len(_SUMMARY_TEMPLATE)
+    return max(2000, BUDGET_CHARS - overhead_chars)
+
 
+def would_truncate(kind: str, fqname: str, signature: str, docstring: str, code: str) -> bool:
+    """
+    Whether :func:`summarize_entity` would have to cut the code to fit the context window,
+    computed without calling Ollama.
 
-def summarize_entity(kind: str, fqname: str, signature: str, docstring: str, code: str, stream: bool = True) -> dict[str, Any]:
+    :param kind: The kind of the entity (e.g., "function", "class")
+    :type kind: str
+    :param fqname: The fully qualified name of the entity
+    :type fqname: str
+    :param signature: The signature of the entity
+    :type signature: str
+    :param docstring: The docstring of the entity
+    :type docstring: str
+    :param code: The code snippet of the entity
+    :type code: str
+    :return: True if the summary would only cover part of the code
+    :rtype: bool
+    """
+    header = f"ENTITY\nkind: {kind}\nfqname: {fqname}\nsignature: {signature}\n\n"
+    doc_block = f"DOCSTRING (may be empty)\n{docstring}\n\n"
+    return min(len(code), MAX_CHARS) > _max_code_chars(header, doc_block)
+
+
+def summarize_entity(
+    kind: str,
+    fqname: str,
+    signature: str,
+    docstring: str,
+    code: str,
+    stream: bool = True,
+    post: Callable[[str, Dict[str, Any]], dict[str, Any]] | None = None,
+) -> dict[str, Any]:
     """
     Summarize a code entity using Ollama.
 
@@ -86,60 +171,32 @@ def summarize_entity(kind: str, fqname: str, signature: str, docstring: str, cod
     :type code: str
     :param stream: Whether to use streaming response from Ollama (default: True)
     :type stream: bool
+    :param post: Transport for the non-streaming request, called as post(url, payload) and returning
+                 Ollama's JSON response (default: :func:`_post_json`); lets callers and tests skip HTTP
+    :type post: Callable[[str, Dict[str, Any]], dict[str, Any]] | None
     :return: A dictionary containing the summary and metadata about the summarization process
     :rtype: dict[str, Any]
     """
 
-    system = (
-        "You are summarizing Python code for a local developer knowledge base.\n"
-        "Rules:\n"
-        "- Be factual; if unclear, write 'unclear'.\n"
-        "- No speculation.\n"
-        "- Keep it compact.\n"
-        "- Output MUST be at most 12 lines.\n"
-    )
+    system = _SYSTEM_PROMPT
+    template = _SUMMARY_TEMPLATE
+    header = f"ENTITY\nkind: {kind}\nfqname: {fqname}\nsignature: {signature}\n\n"
+    doc_block = f"DOCSTRING (may be empty)\n{docstring}\n\n"
 
-    was_truncated = len(code) > MAX_CHARS
     code = code[:MAX_CHARS]
-
-    template = (
-        "Produce a 12-lines-or-less structured summary with these headings:\n"
-        "1) Purpose:\n"
-        "2) Responsibilities:\n"
-        "3) Inputs/Outputs:\n"
-        "4) Side effects:\n"
-        "5) Error modes:\n"
-        "6) Key methods/flows:\n"
-        "7) Extension points:\n"
-        "8) Related concepts:\n"
-        "(Skip headings that are not applicable, but still stay <=12 lines.)\n"
-        "Last line MUST be: Coverage: full|partial|unclear\n"
-    )
-
-    base_user = (
-        f"ENTITY\nkind: {kind}\nfqname: {fqname}\nsignature: {signature}\n\n"
-        f"DOCSTRING (may be empty)\n{docstring}\n\n"
-        f"CODE\n\n"
-        f"{template}"
-    )
-    overhead_chars = len(system) + 2 + len(base_user)
-
-    max_code_chars = max(2000, BUDGET_CHARS - overhead_chars)
-
+    max_code_chars = _max_code_chars(header, doc_block)
     was_truncated = len(code) > max_code_chars
     code = code[:max_code_chars]
 
+    user = "".join([
+        header,
+        f"NOTE\ncode_truncated: {was_truncated}\nmax_chars: {MAX_CHARS}\n\n",
+        doc_block,
+        "CODE\n", code, "\n\n",
+        template,
+    ])
 
-    user = (
-        f"ENTITY\nkind: {kind}\nfqname: {fqname}\nsignature: {signature}\n\n"
-        f"NOTE\ncode_truncated: {was_truncated}\nmax_chars: {MAX_CHARS}\n\n"
-        f"DOCSTRING (may be empty)\n{docstring}\n\n"
-        f"CODE\n{code}\n\n"
-        f"{template}"
-    )
-
-    prompt_text = system + "\n\n" + user
-    prompt_chars = len(prompt_text)
+    prompt_chars = len(system) + 2 + len(user)
     approx_tokens = prompt_chars // 4
 
 
@@ -160,26 +217,23 @@ def summarize_entity(kind: str, fqname: str, signature: str, docstring: str, cod
     if stream:
         text = _post_json_stream(url, payload)
     else:
-        out = _post_json(url, payload)
+        out = (post or _post_json)(url, payload)
         text = (out.get("response") or "")
 
     text = text.strip()
-    lines = text.splitlines()
-
-    forced_coverage = "partial" if was_truncated else "full"
-
-    if lines and lines[-1].startswith("Coverage:"):
-        lines[-1] = f"Coverage: {forced_coverage}"
-    else:
-        lines.append(f"Coverage: {forced_coverage}")
-
-    text = "\n".join(lines)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
 
-
-    coverage = "unclear"
-    last = text.splitlines()[-1].strip() if text else ""
+    # Force the final Coverage line: replace the last line if it is one, else append one.
+    # Only the tail is touched, so the summary is not split into lines and rejoined.
+    coverage = "partial" if was_truncated else "full"
+    body, sep, last = text.rpartition("\n")
     if last.startswith("Coverage:"):
-        coverage = last.split(":", 1)[1].strip()
+        text = f"{body}{sep}Coverage: {coverage}"
+    elif text:
+        text = f"{text}\nCoverage: {coverage}"
+    else:
+        text = f"Coverage: {coverage}"
 
     return {
         "summary": text,
@@ -1,46 +1,51 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any
-import sqlite3
+from typing import Any, Sequence
+import functools
 import re
 
-def _connect(db: Path) -> sqlite3.Connection:
-    """
-    Establish a connection to the SQLite database.
-    
-    :param db: Path to the SQLite database file
-    :type db: Path
-    :return: SQLite connection object
-    :rtype: sqlite3.Connection
+from context6.core.retrieve import _connect, _kind_placeholders, _read_line_range
+
+_INIT_RE = re.compile(r"^\s*def\s+__init__\s*\(")
+
+
+def _first_nonempty_line(text: str) -> str:
     """
+    Return the first line of text that is not blank.
 
-    con = sqlite3.connect(str(db))
-    con.row_factory = sqlite3.Row
-    return con
+    :param text: Text to scan
+    :type text: str
+    :return: The first non-blank line, or an empty string if there is none
+    :rtype: str
+    """
+    return next((ln for ln in text.splitlines() if ln.strip()), "")
 
 
-def _extract_init_header(snippet_text: str) -> str:
+def _extract_init_header(lines: Sequence[str]) -> str:
     """
     Try to find the __init__ def line (and decorator lines just above it).
     Returns a short block (<= ~10 lines).
     
-    :param snippet_text: The text of the code snippet to search
-    :type snippet_text: str
+    :param lines: Lines of the code snippet to search (without line endings)
+    :type lines: Sequence[str]
     :return: The extracted __init__ header block, or an empty string if not found
     :rtype: str
     """
-    lines = snippet_text.splitlines()
+    # One forward pass: remember where the current run of decorator lines began instead
+    # of scanning back from the def
+    dec_start: int | None = None
     for i, line in enumerate(lines):
-        if re.match(r"^\s*def\s+__init__\s*\(", line):
+        stripped = line.lstrip()
+        if stripped.startswith("@"):
+            if dec_start is None:
+                dec_start = i
+            continue
+        if stripped.startswith("def") and _INIT_RE.match(line):
             # include up to 3 decorator lines above
-            start = i
-            j = i - 1
-            while j >= 0 and lines[j].lstrip().startswith("@") and (i - j) <= 3:
-                start = j
-                j -= 1
-            end = min(len(lines), i + 8)
-            return "\n".join(lines[start:end]).rstrip()
+            start = i if dec_start is None else max(dec_start, i - 3)
+            return "\n".join(lines[start:i + 8]).rstrip()
+        dec_start = None
     return ""
 
 def _small_snippet_for_entity(arc_root: Path, e: dict[str, Any], max_lines: int = 40) -> str:
@@ -49,10 +54,12 @@ def _small_snippet_for_entity(arc_root: Path, e: dict[str, Any], max_lines: int
     Otherwise: first max_lines of the entity block.
     """
     file_path = arc_root / e["file"]
-    lines = file_path.read_text(encoding="utf-8", errors="replace").splitlines()
     start = max(1, int(e["start_line"]))
-    end = min(len(lines), int(e["end_line"]))
-    block = lines[start - 1 : end]
+    # Only the head of the entity is ever shown: up to 800 lines are scanned for a
+    # class's __init__, otherwise max_lines are used
+    read_lines = max(800, max_lines) if e["kind"] == "class" else max_lines
+    end = min(int(e["end_line"]), start + read_lines - 1)
+    block = _read_line_range(file_path, start, end)
 
     if e["kind"] == "class":
         # Pull docstring from DB (already extracted reliably)
@@ -61,8 +68,7 @@ def _small_snippet_for_entity(arc_root: Path, e: dict[str, Any], max_lines: int
         doc_text = "\n".join(doc_first).rstrip()
 
         # Find __init__ header inside the class block (cheap heuristic)
-        block_text = "\n".join(block[:800])  # don’t scan thousands of lines
-        init_hdr = _extract_init_header(block_text)
+        init_hdr = _extract_init_header(block[:800])  # don’t scan thousands of lines
 
         parts = []
         if doc_text:
@@ -93,7 +99,7 @@ def pretty_lookup(db: Path, name: str, arc_root: Path) -> str:
     con = _connect(db)
 
     # Pick best match: exact fqname > tail match > substring
-    rows = con.execute(
+    row = con.execute(
         """
         SELECT * FROM entities
         WHERE fqname = ?
@@ -106,13 +112,13 @@ def pretty_lookup(db: Path, name: str, arc_root: Path) -> str:
         LIMIT 10
         """,
         (name, f"%.{name}", f"%{name}%"),
-    ).fetchall()
+    ).fetchone()
 
-    if not rows:
+    if row is None:
         return f"No matches for: {name}"
 
     # choose first row as best (we can rank later if needed)
-    e = dict(rows[0])
+    e = dict(row)
 
     header = f"{e['fqname']}  ({e['kind']})\n{e['file']}:{e['start_line']}-{e['end_line']}\n{(e.get('signature') or '').strip()}"
     summary = (e.get("summary") or "").strip()
@@ -155,6 +161,45 @@ def pretty_lookup_entity(db: Path, arc_root: Path, e: dict[str, Any]) -> str:
     return "\n".join([x for x in out if x]).rstrip()
 
 
+@functools.lru_cache(maxsize=32)
+def _best_match_sql(n_kinds: int, exact: bool = False) -> str:
+    """
+    SQL text for best_match_entity with n kind filters (bound as :k0..:kN). Cached so the
+    identical string hits sqlite3's statement cache.
+
+    :param n_kinds: Number of kinds to filter by
+    :type n_kinds: int
+    :param exact: Only match fqname = :name (an idx_entities_fqname search instead of a LIKE scan)
+    :type exact: bool
+    :return: SQL text
+    :rtype: str
+    """
+    kind_clause = _kind_placeholders(n_kinds, "kind", True)
+    if exact:
+        match_clause = "fqname = :name"
+        match_rank = ""
+    else:
+        # One scan with a CASE rank: exact (0) > tail (1) > substring (2)
+        match_clause = "(fqname = :name OR fqname LIKE :tail OR fqname LIKE :sub)"
+        match_rank = "CASE WHEN fqname = :name THEN 0 WHEN fqname LIKE :tail THEN 1 ELSE 2 END,"
+    return f"""
+        SELECT *
+        FROM entities
+        WHERE {match_clause}{kind_clause}
+        ORDER BY
+            {match_rank}
+            CASE kind
+                WHEN 'class' THEN 0
+                WHEN 'module' THEN 1
+                WHEN 'function' THEN 2
+                WHEN 'method' THEN 3
+                ELSE 9
+            END,
+            fqname
+        LIMIT 1
+        """
+
+
 def best_match_entity(
     db: Path,
     name: str,
@@ -177,49 +222,13 @@ def best_match_entity(
     """
 
     con = _connect(db)
-    kind_clause = ""
-    kind_params: tuple[Any, ...] = ()
-    if kinds:
-        norm = [k.strip() for k in kinds if k and k.strip()]
-        if norm:
-            placeholders = ",".join(["?"] * len(norm))
-            kind_clause = f" AND kind IN ({placeholders})"
-            kind_params = tuple(norm)
-
-    rows = con.execute(
-        f"""
-        SELECT e.*
-        FROM entities e
-        JOIN (
-            SELECT id, MIN(rank) AS best_rank
-            FROM (
-                SELECT id, 0 AS rank FROM entities WHERE fqname = ?{kind_clause}
-                UNION ALL
-                SELECT id, 1 AS rank FROM entities WHERE fqname LIKE ?{kind_clause}
-                UNION ALL
-                SELECT id, 2 AS rank FROM entities WHERE fqname LIKE ?{kind_clause}
-            )
-            GROUP BY id
-        ) r ON r.id = e.id
-        ORDER BY
-            r.best_rank,
-            CASE e.kind
-                WHEN 'class' THEN 0
-                WHEN 'module' THEN 1
-                WHEN 'function' THEN 2
-                WHEN 'method' THEN 3
-                ELSE 9
-            END,
-            e.fqname
-        LIMIT 1
-        """,
-        (
-            name,
-            *kind_params,
-            f"%.{name}",
-            *kind_params,
-            f"%{name}%",
-            *kind_params,
-        ),
-    ).fetchall()
-    return dict(rows[0]) if rows else None
+    params: dict[str, Any] = {"name": name, "tail": f"%.{name}", "sub": f"%{name}%"}
+    norm = [k.strip() for k in kinds if k and k.strip()] if kinds else []
+    params.update({f"k{i}": k for i, k in enumerate(norm)})
+
+    # An exact hit always ranks first, and is an index search; only fall back to the
+    # LIKE scan when there is none
+    row = con.execute(_best_match_sql(len(norm), exact=True), params).fetchone()
+    if row is None:
+        row = con.execute(_best_match_sql(len(norm)), params).fetchone()
+    return dict(row) if row is not None else None
@@ -1,28 +1,267 @@
 from __future__ import annotations
-from contextlib import closing
+from array import array
+from collections import OrderedDict
+import functools
+import json
+import mmap
+import os
+from contextlib import nullcontext
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Any, Mapping
+from typing import Any, ContextManager, Iterator, Mapping
 import re
 
-_FQNAME_LIKE = re.compile(r"^[A-Za-z0-9_.]+$")
-_CODE_LIKE = re.compile(r"(^from\s+[\w.]+\s+import\s+[\w*]+$)|(^import\s+[\w.]+$)")
+from context6.db.sqlite import _CACHED_STATEMENTS
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # optional speedup
+    _json_loads = json.loads
+
+_FQNAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.")
+_CODE_LIKE = re.compile(r"(^from\s+[\w.]+\s+import\s+[\w*]+$)|(^import\s+[\w.]+$)", re.ASCII)
 _IDENT = re.compile(r"[A-Za-z_]\w*")
+_FROM_IMPORT = re.compile(r"^\s*from\s+([A-Za-z_][\w.]*)\s+import\s+(.+?)\s*$")
+_IMPORT = re.compile(r"^\s*import\s+([A-Za-z_][\w.]*)")
+# Punctuation around symbol names in resolve queries, mapped to spaces by str.translate
+_RESOLVE_PUNCT = str.maketrans(dict.fromkeys("`()[]{}:,", " "))
+_FTS_STRING = re.compile(r'"[^"]*"')
+# Characters FTS5 rejects anywhere outside a quoted string ('-', '{' and '}' are left
+# out: they are legal in column filters)
+_FTS_INVALID_CHARS = frozenset("!#$%&',./;<=>?@[\\]`|~")
+
+class _CheckedConnection(sqlite3.Connection):
+    """
+    Connection that remembers whether :func:`_ensure_initialized` already passed, so
+    long-lived connections (the per-thread cache, eval's shared one) check the schema once.
+    """
+
+    initialized = False
+
+
+_MAX_CACHED_CONNECTIONS = 8
+_local = threading.local()
+
+
+def _open_readonly(db_path: Path) -> sqlite3.Connection:
+    """
+    Open a new read-only connection (query_only, no writes to the file, not even pragmas).
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :return: SQLite connection object (``sqlite3.Row`` rows)
+    :rtype: sqlite3.Connection
+    """
+    # Hot statements are fixed (lru_cached) SQL strings, so the connection's statement cache
+    # prepares each one once and reuses it for the connection's lifetime
+    conn = sqlite3.connect(str(db_path), factory=_CheckedConnection, cached_statements=_CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    # journal_mode=WAL is persisted in the file by init_db, so readers get it without writing here;
+    # temp_store keeps ORDER BY / DISTINCT scratch b-trees in memory.
+    conn.executescript(
+        "PRAGMA query_only=ON; PRAGMA temp_store=MEMORY; PRAGMA mmap_size=268435456; PRAGMA cache_size=-64000;"
+    )
+    return conn
+
 
 def _connect(db_path: Path) -> sqlite3.Connection:
     """
-    Establish a connection to the SQLite database.
+    Return this thread's cached read-only connection to the SQLite database, opening it on first use.
+    Callers must not close it; the least recently used connection is closed once more than
+    _MAX_CACHED_CONNECTIONS databases are open in a thread.
     
     :param db_path: Path to the SQLite database file
     :type db_path: Path
     :return: SQLite connection object
     :rtype: sqlite3.Connection
     """
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    cache: OrderedDict[str, sqlite3.Connection] | None = getattr(_local, "conns", None)
+    if cache is None:
+        cache = _local.conns = OrderedDict()
+    key = str(db_path)
+    conn = cache.get(key)
+    if conn is not None:
+        cache.move_to_end(key)
+        return conn
+
+    conn = _open_readonly(db_path)
+    cache[key] = conn
+    if len(cache) > _MAX_CACHED_CONNECTIONS:
+        _, oldest = cache.popitem(last=False)
+        oldest.close()
     return conn
 
 
+def close_cached_connections() -> None:
+    """
+    Close and forget this thread's cached connections (e.g. before replacing a DB file).
+    """
+    cache = getattr(_local, "conns", None)
+    while cache:
+        _, conn = cache.popitem()
+        conn.close()
+
+
+def _open(db_path: Path, con: sqlite3.Connection | None) -> ContextManager[sqlite3.Connection]:
+    """
+    Use a caller-owned connection if given, otherwise this thread's cached one. Neither is closed.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :param con: Optional shared connection; should use ``sqlite3.Row`` as row factory
+    :type con: sqlite3.Connection | None
+    :return: Context manager yielding the connection
+    :rtype: ContextManager[sqlite3.Connection]
+    """
+    return nullcontext(con if con is not None else _connect(db_path))
+
+
+# Sized for run_summarize, whose kind-then-fqname order revisits each module once per kind
+@functools.lru_cache(maxsize=256)
+def _read_lines(path_str: str, mtime_ns: int, size: int) -> tuple[str, ...]:
+    """
+    Read a text file into a tuple of lines (without line endings). Cached per file version:
+    mtime_ns and size are part of the key so an edited file is re-read.
+
+    :param path_str: Path to the file
+    :type path_str: str
+    :param mtime_ns: File modification time in nanoseconds (cache key only)
+    :type mtime_ns: int
+    :param size: File size in bytes (cache key only)
+    :type size: int
+    :return: Lines of the file
+    :rtype: tuple[str, ...]
+    """
+    if size == 0:
+        return ()
+    # One raw read + decode instead of a TextIOWrapper iterated line by line
+    text = Path(path_str).read_bytes().decode("utf-8", errors="replace")
+    if "\r" in text:
+        # Same universal-newline handling as text mode
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return tuple(lines)
+
+
+# Files at least this large are read through mmap and a cached line-offset index, so only
+# the requested lines are decoded and the cache holds offsets rather than every line
+_MMAP_MIN_BYTES = 1 << 20
+
+
+@functools.lru_cache(maxsize=32)
+def _line_starts(path_str: str, mtime_ns: int, size: int) -> array | None:
+    """
+    Byte offset of the start of every line of a file (plus one past a trailing newline).
+    Cached per file version like :func:`_read_lines`.
+
+    :param path_str: Path to the file
+    :type path_str: str
+    :param mtime_ns: File modification time in nanoseconds (cache key only)
+    :type mtime_ns: int
+    :param size: File size in bytes (cache key only)
+    :type size: int
+    :return: Line start offsets, or None if the file has '\r' line endings (use :func:`_read_lines`)
+    :rtype: array | None
+    """
+    with open(path_str, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm.find(b"\r") != -1:
+            return None
+        starts = array("Q", [0])
+        pos = mm.find(b"\n")
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = mm.find(b"\n", pos + 1)
+    return starts
+
+
+def _read_line_range_mmap(path_str: str, starts: array, size: int, start: int, end: int) -> list[str]:
+    """
+    Decode only lines start..end (1-based, inclusive) of a file, given its line offsets.
+
+    :param path_str: Path to the file
+    :type path_str: str
+    :param starts: Line start offsets from :func:`_line_starts`
+    :type starts: array
+    :param size: File size in bytes
+    :type size: int
+    :param start: First line to return (1-based)
+    :type start: int
+    :param end: Last line to return (inclusive)
+    :type end: int
+    :return: The requested lines, without line endings
+    :rtype: list[str]
+    """
+    n_lines = len(starts) - 1 if starts[-1] == size else len(starts)
+    end = min(end, n_lines)
+    if start > end:
+        return []
+    stop = starts[end] if end < len(starts) else size
+    with open(path_str, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Slices start on line boundaries, so no UTF-8 sequence is cut
+        text = mm[starts[start - 1] : stop].decode("utf-8", errors="replace")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def _read_line_range(path: Path, start: int, end: int) -> list[str]:
+    """
+    Return lines start..end (1-based, inclusive) of a text file, via the per-file line cache
+    so repeated snippets from one module read it once (large files: via mmap and a cached
+    line-offset index). Fewer lines are returned if the file is shorter.
+
+    :param path: Path to the file
+    :type path: Path
+    :param start: First line to return (1-based)
+    :type start: int
+    :param end: Last line to return (inclusive)
+    :type end: int
+    :return: The requested lines, without line endings
+    :rtype: list[str]
+    """
+    if end < start:
+        return []
+    st = os.stat(path)
+    path_str = str(path)
+    if st.st_size >= _MMAP_MIN_BYTES:
+        starts = _line_starts(path_str, st.st_mtime_ns, st.st_size)
+        if starts is not None:
+            return _read_line_range_mmap(path_str, starts, st.st_size, start, end)
+    lines = _read_lines(path_str, st.st_mtime_ns, st.st_size)
+    return list(lines[start - 1 : end])
+
+
+# Entity columns returned by lookup_symbol/search (bookkeeping columns such as
+# code_hash or summary_error are left out)
+_RESULT_COLS = ("id", "kind", "fqname", "file", "start_line", "end_line", "signature", "docstring", "summary")
+
+
+def _query_dicts(con: sqlite3.Connection, sql: str, params: Any) -> list[dict[str, Any]]:
+    """
+    Run a query and build one dict per row straight from the raw tuples, skipping sqlite3.Row.
+
+    :param con: Database connection object
+    :type con: sqlite3.Connection
+    :param sql: SQL text
+    :type sql: str
+    :param params: Bound parameters (sequence or mapping)
+    :type params: Any
+    :return: Rows as dictionaries keyed by column name
+    :rtype: list[dict[str, Any]]
+    """
+    cur = con.cursor()
+    cur.row_factory = None
+    cur.execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur]
+
+
 def _has_table(con: sqlite3.Connection, table: str) -> bool:
     """
     Check if a specific table exists in the SQLite database.
@@ -52,7 +291,11 @@ def _ensure_initialized(con: sqlite3.Connection, db_path: Path) -> None:
     :type db_path: Path
     :raises RuntimeError: If the required tables are missing
     """
+    if getattr(con, "initialized", False):
+        return
     if _has_table(con, "entities") and _has_table(con, "entities_fts"):
+        if isinstance(con, _CheckedConnection):
+            con.initialized = True
         return
     raise RuntimeError(
         "Database does not look like a context6 index (missing tables). "
@@ -76,30 +319,6 @@ def _normalize_kinds(kinds: list[str] | tuple[str, ...] | None) -> list[str] | N
     return out or None
 
 
-def _fqname_boost(fqname: str, query: str) -> int:
-    """
-    Calculate a boost score for a fully qualified name (FQNAME) based on a query.
-
-    :param fqname: Fully qualified name of the entity
-    :type fqname: str
-    :param query: Query string to match against the FQNAME
-    :type query: str
-    :return: Boost score based on the match
-    :rtype: int
-    """
-    q = (query or "").strip().lower()
-    f = (fqname or "").strip().lower()
-    if not q or not f:
-        return 0
-    if q == f:
-        return 1000
-    if q == f.rsplit(".", 1)[-1]:
-        return 600
-    if q in f:
-        return 250
-    return 0
-
-
 def _fts_phrase(q: str) -> str:
     """Escape a string to be used as a literal phrase in an FTS5 query.
     This is a simple heuristic that wraps the string in double quotes and escapes internal quotes.
@@ -108,6 +327,37 @@ def _fts_phrase(q: str) -> str:
     q = q.replace('"', '""')
     return f'"{q}"'
 
+def _needs_quoting(q: str) -> bool:
+    """
+    Whether an FTS5 query is certain to be a syntax error: an unbalanced double quote,
+    or a character FTS5 never accepts outside a quoted string.
+    Queries this misses still fall back to a quoted retry in :func:`search`.
+
+    :param q: The (normalized) FTS5 query
+    :type q: str
+    :return: True if the query should be quoted before running it
+    :rtype: bool
+    """
+    if '"' in q:
+        if q.count('"') % 2:
+            return True
+        q = _FTS_STRING.sub(" ", q)
+    return not _FTS_INVALID_CHARS.isdisjoint(q)
+
+
+def _is_fqname_like(q: str) -> bool:
+    """
+    Whether q is non-empty and made only of ASCII letters, digits, '_' and '.'.
+    A set check instead of a regex, since this runs on every search.
+
+    :param q: The query string to check
+    :type q: str
+    :return: True if the query looks like a (possibly dotted) symbol name
+    :rtype: bool
+    """
+    return bool(q) and _FQNAME_CHARS.issuperset(q)
+
+
 def _normalize_fts_query(q: str) -> str:
     """
     Normalize a full-text search query for FTS5, treating fqnames and code-like queries as literal phrases.
@@ -118,18 +368,101 @@ def _normalize_fts_query(q: str) -> str:
     :rtype: str
     """
     q = q.strip()
-    if _FQNAME_LIKE.fullmatch(q):
+    if _is_fqname_like(q):
         return _fts_phrase(q)
+    if "import" not in q and "from" not in q:
+        # Every code-like shape below mentions one of these
+        return q
     if _CODE_LIKE.fullmatch(q) or (("." in q) and (" " in q) and ("import" in q or "from" in q)):
         return _fts_phrase(q)
     return q
 
 
+def _kind_placeholders(n_kinds: int, column: str, named: bool) -> str:
+    """
+    Build the ``AND <column> IN (...)`` clause for n kind filters (empty when n is 0).
+
+    :param n_kinds: Number of kinds to bind
+    :type n_kinds: int
+    :param column: Column to filter (e.g. "kind" or "e.kind")
+    :type column: str
+    :param named: Use named :k0, :k1, ... placeholders instead of positional ``?``
+    :type named: bool
+    :return: SQL fragment
+    :rtype: str
+    """
+    if not n_kinds:
+        return ""
+    marks = [f":k{i}" for i in range(n_kinds)] if named else ["?"] * n_kinds
+    return f" AND {column} IN ({','.join(marks)})"
+
+
+@functools.lru_cache(maxsize=32)
+def _lookup_sql(n_kinds: int) -> str:
+    """
+    SQL text for lookup_symbol with n kind filters. Cached so the exact same string is
+    reused and hits sqlite3's per-connection statement cache.
+
+    :param n_kinds: Number of kinds bound as :k0..:kN
+    :type n_kinds: int
+    :return: SQL text
+    :rtype: str
+    """
+    # Prefer exact fqname match; fall back to tail match, then substring.
+    # One scan with a CASE rank instead of three UNIONed scans. With kinds, the
+    # UNIQUE(kind, fqname) index turns the scan into an index search on kind.
+    return f"""
+        SELECT {", ".join(_RESULT_COLS)},
+            CASE WHEN fqname = :name THEN 0 WHEN fqname LIKE :tail THEN 1 ELSE 2 END AS rank
+        FROM entities
+        WHERE (fqname = :name OR fqname LIKE :tail OR fqname LIKE :sub){_kind_placeholders(n_kinds, "kind", True)}
+        ORDER BY rank, kind, fqname
+        LIMIT :limit
+        """
+
+
+@functools.lru_cache(maxsize=32)
+def _search_sql(n_kinds: int) -> str:
+    """
+    SQL text for search with n kind filters (bound as :k0..:kN). Cached like :func:`_lookup_sql`.
+
+    Results are ordered by an fqname boost (exact > last segment > substring of the
+    lowercased query :q), then BM25, kind and fqname, so SQLite can stop at :limit.
+
+    :param n_kinds: Number of kinds to filter by
+    :type n_kinds: int
+    :return: SQL text
+    :rtype: str
+    """
+    fq = "lower(trim(e.fqname))"
+    return f"""
+        SELECT {", ".join("e." + c for c in _RESULT_COLS)}, f.rank AS fts_score
+        FROM entities_fts f
+        JOIN entities e ON e.id = f.rowid
+        WHERE entities_fts MATCH :query
+        {_kind_placeholders(n_kinds, "e.kind", True)}
+        ORDER BY
+            CASE
+                WHEN :q = '' OR length(e.fqname) < length(:q) THEN 3
+                -- Exact and tail matches both contain :q, so one instr() settles most rows
+                WHEN instr({fq}, :q) = 0 THEN 3
+                WHEN {fq} = :q THEN 0
+                WHEN instr(:q, '.') = 0 AND substr({fq}, -length(:q) - 1) = '.' || :q THEN 1
+                ELSE 2
+            END,
+            f.rank,
+            e.kind,
+            e.fqname
+        LIMIT :limit
+        """
+
+
 def lookup_symbol(
     db: Path,
     name: str,
     limit: int = 25,
     kinds: list[str] | tuple[str, ...] | None = None,
+    con: sqlite3.Connection | None = None,
 ) -> dict[str, Any]:
     """
     Lookup symbols in the database by name, with optional filtering by kind and limit on number of results.
@@ -143,43 +476,37 @@ def lookup_symbol(
     :type limit: int
     :param kinds: List or tuple of kind strings to filter by, or None for no filtering
     :type kinds: list[str] | tuple[str, ...] | None
+    :param con: Optional open connection to reuse across calls (not closed here)
+    :type con: sqlite3.Connection | None
     :return: Dictionary containing the matched symbols
     :rtype: dict[str, Any]
     """
 
-    with closing(_connect(db)) as con:
+    with _open(db, con) as con:
         _ensure_initialized(con, db)
         kinds = _normalize_kinds(kinds)
-        kind_clause = ""
-        kind_params: tuple[Any, ...] = ()
+        params: dict[str, Any] = {
+            "name": name,
+            "tail": f"%.{name}",
+            "sub": f"%{name}%",
+            "limit": limit,
+        }
         if kinds:
-            placeholders = ",".join(["?"] * len(kinds))
-            kind_clause = f" AND kind IN ({placeholders})"
-            kind_params = tuple(kinds)
-        # Prefer exact fqname match; fall back to tail match
-        q = f"""
-        SELECT *, 0 AS rank FROM entities WHERE fqname = ?{kind_clause}
-        UNION
-        SELECT *, 1 AS rank FROM entities WHERE fqname LIKE ?{kind_clause}
-        UNION
-        SELECT *, 2 AS rank FROM entities WHERE fqname LIKE ?{kind_clause}
-        ORDER BY rank, kind, fqname
-        LIMIT ?
-        """
-        params = (
-            name,
-            *kind_params,
-            f"%.{name}",
-            *kind_params,
-            f"%{name}%",
-            *kind_params,
-            limit,
-        )
-        rows = con.execute(q, params).fetchall()
-        return {"matches": [dict(r) for r in rows]}
+            params.update({f"k{i}": k for i, k in enumerate(kinds)})
+        return {"matches": _query_dicts(con, _lookup_sql(len(kinds or ())), params)}
+
 
+# Messages of OperationalErrors raised while FTS5 parses a MATCH expression
+_FTS_QUERY_ERRORS = ("fts5: syntax error", "no such column", "unterminated string", "unknown special query")
 
-def search(db: Path, query: str, limit: int = 10, kinds=None) -> dict[str, Any]:
+
+def search(
+    db: Path,
+    query: str,
+    limit: int = 10,
+    kinds=None,
+    con: sqlite3.Connection | None = None,
+) -> dict[str, Any]:
     """
     Search for symbols in the database using a full-text search query, with optional filtering by kind and limit on number of results.
     The algorithm used in the search is as follows:
@@ -187,7 +514,7 @@ def search(db: Path, query: str, limit: int = 10, kinds=None) -> dict[str, Any]:
     1. Normalize the query for FTS5 syntax, with heuristics to treat fqnames and code-like queries as literal phrases.
     2. Execute an FTS5 query against the entities_fts virtual table, joining with entities for metadata, and applying kind filters if provided.
     3. If the FTS5 query fails due to syntax errors (e.g. unbalanced quotes), retry the query with the entire query treated as a literal phrase.
-    4. Rank the results by a combination of FQNAME boost (exact match > tail match > substring) and the FTS5 BM25 score.
+    4. Rank the results in SQL by a combination of FQNAME boost (exact match > tail match > substring) and the FTS5 BM25 score.
     5. Return the top-k results as a list of dictionaries.
 
     :param db: Path to the SQLite database file
@@ -198,6 +525,8 @@ def search(db: Path, query: str, limit: int = 10, kinds=None) -> dict[str, Any]:
     :type limit: int
     :param kinds: List or tuple of kind strings to filter by, or None for no filtering
     :type kinds: list[str] | tuple[str, ...] | None
+    :param con: Optional open connection to reuse across calls (not closed here)
+    :type con: sqlite3.Connection | None
     :return: Dictionary containing the search results
     :rtype: dict[str, Any]
     """
@@ -205,54 +534,41 @@ def search(db: Path, query: str, limit: int = 10, kinds=None) -> dict[str, Any]:
     raw_query = query
     query = _normalize_fts_query(query)
 
-    with closing(_connect(db)) as con:
+    with _open(db, con) as con:
         _ensure_initialized(con, db)
         kinds = _normalize_kinds(kinds)
 
-        kind_clause = ""
-        params: tuple[Any, ...] = (query,)
+        params: dict[str, Any] = {
+            "query": query,
+            "q": (raw_query or "").strip().lower(),
+            "limit": limit,
+        }
         if kinds:
-            placeholders = ",".join(["?"] * len(kinds))
-            kind_clause = f" AND e.kind IN ({placeholders})"
-            params = (query, *kinds)
-
-        q = f"""
-        SELECT e.*, bm25(entities_fts) AS fts_score
-        FROM entities_fts f
-        JOIN entities e ON e.id = f.rowid
-        WHERE entities_fts MATCH ?
-        {kind_clause}
-        ORDER BY bm25(entities_fts)
-        LIMIT ?
-        """
-        candidate_limit = max(limit, min(1000, limit * 20))
+            params.update({f"k{i}": k for i, k in enumerate(kinds)})
+        q = _search_sql(len(kinds or ()))
 
+        phrase = _fts_phrase(raw_query.strip())
+        if _needs_quoting(query):
+            params["query"] = phrase
         try:
-            rows = con.execute(q, (*params, candidate_limit)).fetchall()
-        except sqlite3.OperationalError as e:
-            msg = str(e)
-            if "fts5: syntax error" in msg:
-                # Retry as a literal phrase
-                quoted = _fts_phrase(raw_query.strip())
-                retry_params = (quoted, *kinds) if kinds else (quoted,)
-                rows = con.execute(q, (*retry_params, candidate_limit)).fetchall()
-                query = quoted 
-            else:
+            rows = _query_dicts(con, q, params)
+        except sqlite3.OperationalError as err:
+            # Locks, missing tables, ... are not query problems: only MATCH parse errors are retried
+            if params["query"] == phrase or not str(err).startswith(_FTS_QUERY_ERRORS):
                 raise
+            # Safety net for FTS syntax the preflight does not catch: retry once as a literal phrase
+            params["query"] = phrase
+            rows = _query_dicts(con, q, params)
 
-        ranked = sorted(
-            rows,
-            key=lambda r: (
-                -_fqname_boost(r["fqname"], raw_query),
-                float(r["fts_score"]),
-                r["kind"],
-                r["fqname"],
-            ),
-        )
-        return {"results": [dict(r) for r in ranked[:limit]]}
+        return {"results": rows}
 
 
-def get_snippet(db: Path, fqname: str) -> dict[str, Any]:
+def get_snippet(
+    db: Path,
+    fqname: str,
+    max_lines: int | None = None,
+    source_root: Path | None = None,
+) -> dict[str, Any]:
     """
     Retrieve a snippet of code for a given fully qualified name (fqname) from the database.
 
@@ -260,6 +576,11 @@ def get_snippet(db: Path, fqname: str) -> dict[str, Any]:
     :type db: Path
     :param fqname: Fully qualified name of the entity to retrieve
     :type fqname: str
+    :param max_lines: If given, only the first max_lines lines go into "text", and "line_count" /
+        "was_truncated" describe the full entity
+    :type max_lines: int | None
+    :param source_root: Root of the source tree; defaults to the CONTEXT6_SOURCE_ROOT env var
+    :type source_root: Path | None
     :return: Dictionary containing the snippet information, including file path, line numbers, and code text
     :rtype: dict[str, Any]
     """
@@ -274,26 +595,77 @@ def get_snippet(db: Path, fqname: str) -> dict[str, Any]:
 
     # You stored file paths relative to ARC root in the DB.
     # Put the ARC root path in a tiny metadata table later; for MVP pass it in as env var.
-    import os
-    arc_root = os.environ.get("CONTEXT6_SOURCE_ROOT")
-    if not arc_root:
-        return {"error": "Set CONTEXT6_SOURCE_ROOT=/path/to/ARC"}
+    if source_root is None:
+        arc_root = os.environ.get("CONTEXT6_SOURCE_ROOT")
+        if not arc_root:
+            return {"error": "Set CONTEXT6_SOURCE_ROOT=/path/to/ARC"}
+        source_root = Path(arc_root)
 
-    path = Path(arc_root) / row["file"]
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    path = source_root / row["file"]
     start = max(1, int(row["start_line"]))
-    end = min(len(lines), int(row["end_line"]))
-    text = "\n".join(lines[start - 1 : end])
+    block = _read_line_range(path, start, int(row["end_line"]))
+    end = start + len(block) - 1
 
-    return {
+    out = {
         "fqname": fqname,
         "kind": row["kind"],
         "signature": row["signature"],
         "file": row["file"],
         "start_line": start,
         "end_line": end,
-        "text": text,
     }
+    if max_lines is None:
+        out["text"] = "\n".join(block)
+    else:
+        # Join only the lines that are returned
+        out["text"] = "\n".join(block[:max_lines])
+        out["was_truncated"] = len(block) > max_lines
+        out["line_count"] = len(block)
+    return out
+
+
+def _resolve_candidates(raw_query: str) -> Iterator[str]:
+    """
+    Yield candidate symbol names for a stripped resolve query, in priority order (may repeat).
+
+    :param raw_query: The stripped query string
+    :type raw_query: str
+    :return: Iterator of candidate names (unstripped, possibly empty or duplicated)
+    :rtype: Iterator[str]
+    """
+    # The import regexes are anchored, so a prefix check rules them out cheaply
+    if raw_query.startswith("from"):
+        from_m = _FROM_IMPORT.match(raw_query)
+        if from_m:
+            mod = from_m.group(1)
+            for part in from_m.group(2).split(","):
+                sym = part.strip().split(" as ", 1)[0].strip()
+                if _IDENT.fullmatch(sym):
+                    yield sym
+                    yield f"{mod}.{sym}"
+    elif raw_query.startswith("import"):
+        import_m = _IMPORT.match(raw_query)
+        if import_m:
+            mod = import_m.group(1)
+            yield mod
+            yield mod.rsplit(".", 1)[-1]
+
+    if "." in raw_query:
+        for tok in raw_query.translate(_RESOLVE_PUNCT).split():
+            if "." not in tok:
+                continue
+            parts = [p for p in tok.split(".") if p]
+            if not parts:
+                continue
+            yield tok
+            yield parts[-1]
+            if len(parts) >= 2:
+                yield ".".join(parts[-2:])
+                yield parts[-2]
+
+    yield raw_query
+    if "." in raw_query:
+        yield raw_query.rsplit(".", 1)[-1]
 
 
 def normalize_resolve_query(query: str) -> dict[str, Any]:
@@ -315,48 +687,8 @@ def normalize_resolve_query(query: str) -> dict[str, Any]:
     if not raw_query:
         return {"raw_query": raw_query, "normalized_query": "", "candidates": []}
 
-    candidates: list[str] = []
-    seen: set[str] = set()
-
-    def add(v: str) -> None:
-        v = v.strip()
-        if not v or v in seen:
-            return
-        seen.add(v)
-        candidates.append(v)
-
-    from_m = re.match(r"^\s*from\s+([A-Za-z_][\w.]*)\s+import\s+(.+?)\s*$", raw_query)
-    if from_m:
-        mod = from_m.group(1)
-        imported = from_m.group(2)
-        for part in imported.split(","):
-            sym = part.strip().split(" as ", 1)[0].strip()
-            if not _IDENT.fullmatch(sym):
-                continue
-            add(sym)
-            add(f"{mod}.{sym}")
-
-    import_m = re.match(r"^\s*import\s+([A-Za-z_][\w.]*)", raw_query)
-    if import_m:
-        mod = import_m.group(1)
-        add(mod)
-        add(mod.rsplit(".", 1)[-1])
-
-    cleaned = re.sub(r"[`()\[\]{}:,]+", " ", raw_query)
-    dotted = [t.strip() for t in re.split(r"\s+", cleaned) if "." in t]
-    for tok in dotted:
-        parts = [p for p in tok.split(".") if p]
-        if not parts:
-            continue
-        add(tok)
-        add(parts[-1])
-        if len(parts) >= 2:
-            add(".".join(parts[-2:]))
-            add(parts[-2])
-
-    add(raw_query)
-    if "." in raw_query:
-        add(raw_query.rsplit(".", 1)[-1])
+    # dict.fromkeys dedupes while keeping first-seen order
+    candidates = list(dict.fromkeys(v for v in map(str.strip, _resolve_candidates(raw_query)) if v))
 
     return {
         "raw_query": raw_query,
@@ -385,17 +717,137 @@ def tiny_entity_snippet(
 
     rel_file = str(entity["file"])
     path = source_root / rel_file
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
     start = max(1, int(entity["start_line"]))
-    end = min(len(lines), start + max(1, max_lines) - 1)
+    block = _read_line_range(path, start, start + max(1, max_lines) - 1)
     return {
         "file": rel_file,
         "start_line": start,
-        "end_line": end,
-        "text": "\n".join(lines[start - 1 : end]),
+        "end_line": start + len(block) - 1,
+        "text": "\n".join(block),
     }
 
 
+def entity_snippet(source_root: Path, entity: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Full source of an entity read straight from its row's file and line range, with no DB lookup
+    (cf. get_snippet, which resolves an fqname first). Goes through the per-file line cache.
+
+    :param source_root: The root directory of the source code
+    :type source_root: Path
+    :param entity: Entity row with file, start_line and end_line
+    :type entity: Mapping[str, Any]
+    :return: A dictionary containing the file path, start line, end line, and snippet text
+    :rtype: dict[str, Any]
+    """
+    rel_file = str(entity["file"])
+    start = max(1, int(entity["start_line"]))
+    block = _read_line_range(source_root / rel_file, start, int(entity["end_line"]))
+    return {
+        "file": rel_file,
+        "start_line": start,
+        "end_line": start + len(block) - 1,
+        "text": "\n".join(block),
+    }
+
+
+_PREFER_EXACT_METHODS = ("__init__", "from_dict", "as_dict", "to_dict", "from_json", "to_json")
+_PREFER_METHOD_PREFIXES = ("from_", "as_", "to_", "get_", "set_", "is_", "has_")
+
+
+def _build_class_methods_sql(limit_param: str = "limit") -> str:
+    """
+    SQL for class_methods: direct methods of a class ranked by naming heuristics
+    (well-known entrypoints 0, conventional prefixes 1, rest 5), then by line number.
+
+    :param limit_param: Name of the bound parameter holding the row limit
+    :type limit_param: str
+    :return: SQL text
+    :rtype: str
+    """
+    exact = ", ".join(f"'{m}'" for m in _PREFER_EXACT_METHODS)
+    # substr() comparisons are case-sensitive, like str.startswith
+    prefixes = " OR ".join(f"substr(method, 1, {len(p)}) = '{p}'" for p in _PREFER_METHOD_PREFIXES)
+    return f"""
+        WITH m AS (
+            SELECT id, kind, fqname, signature, file, start_line, end_line, summary,
+                substr(fqname, :prefix_len) AS method
+            FROM entities
+            -- Exact, case-sensitive prefix as a range ('/' sorts right after '.'), so
+            -- the UNIQUE(kind, fqname) index is searched and substr() below is always valid
+            WHERE kind='method' AND fqname >= :prefix AND fqname < :prefix_end
+        )
+        SELECT id, kind, fqname, signature, file, start_line, end_line, summary
+        FROM m
+        WHERE instr(method, '.') = 0
+        ORDER BY
+            CASE
+                WHEN method IN ({exact}) THEN 0
+                WHEN {prefixes} THEN 1
+                ELSE 5
+            END,
+            start_line,
+            method
+        LIMIT :{limit_param}
+        """
+
+
+_CLASS_METHODS_SQL = _build_class_methods_sql()
+
+
+def _build_module_neighbors_sql(limit_param: str = "limit") -> str:
+    """
+    SQL for module_neighbors. Ranked in SQL: classes/functions before methods, then gap
+    to the reference range (0 when overlapping), then position.
+
+    :param limit_param: Name of the bound parameter holding the row limit
+    :type limit_param: str
+    :return: SQL text
+    :rtype: str
+    """
+    return f"""
+        SELECT id, kind, fqname, signature, file, start_line, end_line, summary
+        FROM entities
+        WHERE file = :file
+          AND kind IN ('class', 'function', 'method')
+          AND (:exclude_id IS NULL OR id != :exclude_id)
+        ORDER BY
+            CASE kind WHEN 'method' THEN 1 ELSE 0 END,
+            CASE
+                WHEN end_line < :start_line THEN :start_line - end_line
+                WHEN start_line > :end_line THEN start_line - :end_line
+                ELSE 0
+            END,
+            start_line,
+            fqname
+        LIMIT :{limit_param}
+        """
+
+
+_MODULE_NEIGHBORS_SQL = _build_module_neighbors_sql()
+
+
+def _build_related_sql() -> str:
+    """
+    SQL for related_entities: class_methods and module_neighbors folded into one JSON
+    document with json_group_array, so the pair costs a single statement. Each branch
+    aggregates a LIMITed, ORDER BY'd subquery, which SQLite materializes in that order;
+    json() keeps the scalar subquery results as JSON rather than quoted strings.
+    """
+    row = (
+        "json_object('id', id, 'kind', kind, 'fqname', fqname, 'signature', signature, 'file', file, "
+        "'start_line', start_line, 'end_line', end_line, 'summary', summary)"
+    )
+    return f"""
+        SELECT json_object(
+            'methods', json((SELECT json_group_array({row}) FROM ({_build_class_methods_sql("methods_limit")}))),
+            'neighbors', json((SELECT json_group_array({row}) FROM ({_build_module_neighbors_sql("neighbors_limit")})))
+        )
+        """
+
+
+_RELATED_SQL = _build_related_sql()
+
+
 def class_methods(db: Path, class_fqname: str, limit: int = 5) -> list[dict[str, Any]]:
     """
     Retrieve a list of methods for a given class, ranked by relevance.
@@ -410,49 +862,17 @@ def class_methods(db: Path, class_fqname: str, limit: int = 5) -> list[dict[str,
     :rtype: list[dict[str, Any]]
     """
 
-    with closing(_connect(db)) as con:
-        rows = con.execute(
-            """
-            SELECT id, kind, fqname, signature, file, start_line, end_line, summary
-            FROM entities
-            WHERE kind='method' AND fqname LIKE ?
-            ORDER BY start_line, fqname
-            LIMIT 250
-            """,
-            (f"{class_fqname}.%",),
-        ).fetchall()
-
-    def _method_name(fqname: str) -> str:
-        if not fqname.startswith(class_fqname + "."):
-            return fqname.rsplit(".", 1)[-1]
-        return fqname[len(class_fqname) + 1 :]
-
-    prefer_exact = {
-        "__init__",
-        "from_dict",
-        "as_dict",
-        "to_dict",
-        "from_json",
-        "to_json",
-    }
-    prefer_prefix = ("from_", "as_", "to_", "get_", "set_", "is_", "has_")
-
-    ranked: list[tuple[tuple[int, int, str], dict[str, Any]]] = []
-    for row in rows:
-        e = dict(row)
-        method = _method_name(e["fqname"])
-        if "." in method:
-            continue
-        if method in prefer_exact:
-            score = 0
-        elif method.startswith(prefer_prefix):
-            score = 1
-        else:
-            score = 5
-        ranked.append(((score, int(e["start_line"]), method), e))
-
-    ranked.sort(key=lambda x: x[0])
-    return [e for _, e in ranked[: max(1, limit)]]
+    with _open(db, None) as con:
+        return _query_dicts(
+            con,
+            _CLASS_METHODS_SQL,
+            {
+                "prefix": f"{class_fqname}.",
+                "prefix_end": f"{class_fqname}/",
+                "prefix_len": len(class_fqname) + 2,
+                "limit": max(1, limit),
+            },
+        )
 
 
 def module_neighbors(
@@ -484,34 +904,105 @@ def module_neighbors(
                 module, ranked by proximity to the reference line numbers and filtered by kind (class, function, method).
     :rtype: list[dict[str, Any]]
     """
-    with closing(_connect(db)) as con:
-        rows = con.execute(
-            """
-            SELECT id, kind, fqname, signature, file, start_line, end_line, summary
-            FROM entities
-            WHERE file = ?
-              AND kind IN ('class', 'function', 'method')
-            ORDER BY start_line, fqname
-            """,
-            (file,),
-        ).fetchall()
-
-    def _distance(row: Mapping[str, Any]) -> int:
-        s = int(row["start_line"])
-        e = int(row["end_line"])
-        if e < start_line:
-            return start_line - e
-        if s > end_line:
-            return s - end_line
-        return 0
-
-    kind_rank = {"class": 0, "function": 0, "method": 1}
-    scored: list[tuple[tuple[int, int, int, str], dict[str, Any]]] = []
+    with _open(db, None) as con:
+        return _query_dicts(
+            con,
+            _MODULE_NEIGHBORS_SQL,
+            {
+                "file": file,
+                "exclude_id": int(exclude_id) if exclude_id is not None else None,
+                "start_line": int(start_line),
+                "end_line": int(end_line),
+                "limit": max(1, limit),
+            },
+        )
+
+
+def related_entities(
+    db: Path,
+    entity: Mapping[str, Any],
+    *,
+    methods_limit: int = 5,
+    neighbors_limit: int = 5,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Fetch both the class methods and the module neighbors of an entity in one query.
+    Methods are those of the entity itself for a class, of its owning class for a method,
+    and empty otherwise; rows and their order match class_methods and module_neighbors.
+
+    :param db: The path to the database containing entity information
+    :type db: Path
+    :param entity: The reference entity (needs kind, fqname, file, start_line, end_line, id)
+    :type entity: Mapping[str, Any]
+    :param methods_limit: The maximum number of class methods to return
+    :type methods_limit: int
+    :param neighbors_limit: The maximum number of neighboring entities to return
+    :type neighbors_limit: int
+    :return: {"class_methods": [...], "module_neighbors": [...]}
+    :rtype: dict[str, list[dict[str, Any]]]
+    """
+    fqname = entity["fqname"]
+    owner: str | None = None
+    if entity["kind"] == "class":
+        owner = fqname
+    elif entity["kind"] == "method" and "." in fqname:
+        owner = fqname.rsplit(".", 1)[0]
+
+    with _open(db, None) as con:
+        (doc,) = con.execute(
+            _RELATED_SQL,
+            {
+                # NULL bounds match nothing, so non-class entities get no methods
+                "prefix": f"{owner}." if owner is not None else None,
+                "prefix_end": f"{owner}/" if owner is not None else None,
+                "prefix_len": len(owner) + 2 if owner is not None else None,
+                "methods_limit": max(1, methods_limit),
+                "file": entity["file"],
+                "exclude_id": int(entity["id"]) if entity.get("id") is not None else None,
+                "start_line": int(entity["start_line"]),
+                "end_line": int(entity["end_line"]),
+                "neighbors_limit": max(1, neighbors_limit),
+            },
+        ).fetchone()
+    related = _json_loads(doc)
+    return {"class_methods": related["methods"], "module_neighbors": related["neighbors"]}
+
+
+def module_neighbors_with_snippets(
+    db: Path,
+    source_root: Path,
+    file: str,
+    start_line: int,
+    end_line: int,
+    *,
+    exclude_id: int | None = None,
+    limit: int = 5,
+    max_lines: int = 10,
+) -> list[dict[str, Any]]:
+    """
+    Same as module_neighbors, with a tiny snippet attached to each row under "snippet".
+    All neighbors live in one module, so its source is read once (through the line cache).
+
+    :param db: The path to the database containing entity information
+    :type db: Path
+    :param source_root: The root directory of the source code
+    :type source_root: Path
+    :param file: The relative file path of the module to search within
+    :type file: str
+    :param start_line: The starting line number of the reference entity
+    :type start_line: int
+    :param end_line: The ending line number of the reference entity
+    :type end_line: int
+    :param exclude_id: An optional entity ID to exclude from the results
+    :type exclude_id: int | None
+    :param limit: The maximum number of neighboring entities to return
+    :type limit: int
+    :param max_lines: The maximum number of lines per snippet
+    :type max_lines: int
+    :return: Neighbor rows as returned by module_neighbors, each with a "snippet" dict
+    :rtype: list[dict[str, Any]]
+    """
+    rows = module_neighbors(db, file, start_line, end_line, exclude_id=exclude_id, limit=limit)
     for row in rows:
-        e = dict(row)
-        if exclude_id is not None and int(e["id"]) == int(exclude_id):
-            continue
-        d = _distance(e)
-        scored.append(((kind_rank.get(e["kind"], 9), d, int(e["start_line"]), e["fqname"]), e))
-    scored.sort(key=lambda x: x[0])
-    return [e for _, e in scored[: max(1, limit)]]
+        row["snippet"] = tiny_entity_snippet(source_root, row, max_lines=max_lines)
+    return rows
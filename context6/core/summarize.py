@@ -1,13 +1,34 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+import os
 from pathlib import Path
 import time
 import sqlite3
+from typing import Any, Iterable
 from context6.core.ollama_summarizer import summarize_entity
 from context6.core.summarize_router import summarize_entity_routed
-from context6.db.sqlite import _connect, get_entities_needing_summary
-from context6.core.retrieve import get_snippet
+from context6.db.sqlite import get_conn, get_entities_needing_summary
+from context6.core.retrieve import entity_snippet, get_snippet
 
 
+# Kept as constants so every call passes the identical string and reuses the
+# connection's prepared statement instead of re-parsing the UPDATE
+_UPDATE_SUMMARY_SQL = """
+    UPDATE entities
+    SET summary=?,
+        summary_hash=?,
+        code_truncated=?,
+        summary_prompt_tokens=?,
+        summary_coverage=?,
+        summary_backend=?,
+        summary_error=NULL,
+        updated_at=datetime('now')
+    WHERE id=?
+    RETURNING length(summary) AS n, summary_coverage, summary_prompt_tokens
+"""
+_UPDATE_SUMMARY_ERROR_SQL = "UPDATE entities SET summary_error=?, updated_at=datetime('now') WHERE id=?"
+
 
 def write_summary_cur(
     con: sqlite3.Connection,
@@ -18,9 +39,10 @@ def write_summary_cur(
     approx_tokens: int,
     coverage: str,
     summary_backend: str,
-) -> None:
+) -> tuple[Any, ...]:
     """
     Write a summary for a code entity to the database.
+    The written values come back via RETURNING, so callers can verify without another query.
     
     :param con: SQLite connection object
     :type con: sqlite3.Connection
@@ -38,40 +60,119 @@ def write_summary_cur(
     :type coverage: str
     :param summary_backend: The backend used for summarization (e.g., "ollama", "codex")
     :type summary_backend: str
+    :return: The updated row's (summary length, summary_coverage, summary_prompt_tokens)
+    :rtype: tuple[Any, ...]
     """
 
     if summary_backend not in ("ollama", "codex"):
         raise ValueError(f"Invalid summary_backend: {summary_backend}")
 
-    cur = con.execute(
-        """
-        UPDATE entities
-        SET summary=?,
-            summary_hash=?,
-            code_truncated=?,
-            summary_prompt_tokens=?,
-            summary_coverage=?,
-            summary_backend=?,
-            summary_error=NULL,
-            updated_at=datetime('now')
-        WHERE id=?
-        """,
+    rows = con.execute(
+        _UPDATE_SUMMARY_SQL,
         (summary, code_hash, int(was_truncated), int(approx_tokens), coverage, summary_backend, entity_id),
-    )
-    if cur.rowcount != 1:
-        raise RuntimeError(f"UPDATE rowcount={cur.rowcount} for id={entity_id}")
+    ).fetchall()
+    if len(rows) != 1:
+        raise RuntimeError(f"UPDATE rowcount={len(rows)} for id={entity_id}")
+    return rows[0]
 
 
 def write_summary_error_cur(con: sqlite3.Connection, entity_id: int, err: str) -> None:
     con.execute(
-        "UPDATE entities SET summary_error=?, updated_at=datetime('now') WHERE id=?",
+        _UPDATE_SUMMARY_ERROR_SQL,
         (err[:500], entity_id),
     )
 
 
+# Commit summary writes every COMMIT_EVERY items or COMMIT_INTERVAL_S seconds, whichever comes first
+COMMIT_EVERY = 32
+COMMIT_INTERVAL_S = 5.0
+
+
+def _summarize_concurrency() -> int:
+    """
+    Number of entities summarized at once: CONTEXT6_CONCURRENCY, else OLLAMA_NUM_PARALLEL, else 1.
+    Values above 1 only help if the Ollama server itself runs requests in parallel
+    (OLLAMA_NUM_PARALLEL on the server; OLLAMA_MAX_LOADED_MODELS if several models are used).
+
+    :return: Number of worker threads (at least 1)
+    :rtype: int
+    """
+    raw = os.environ.get("CONTEXT6_CONCURRENCY") or os.environ.get("OLLAMA_NUM_PARALLEL") or "1"
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return 1
+
+
+def _summarize_task(e: sqlite3.Row, code: str, summarizer: str, codex_bin: str) -> tuple[dict[str, Any] | None, str | None, float]:
+    """
+    Summarize one entity in a worker thread. Never touches the database.
+
+    :param e: Entity row from get_entities_needing_summary
+    :type e: sqlite3.Row
+    :param code: Source snippet of the entity
+    :type code: str
+    :param summarizer: Summarization mode ("auto", "ollama", "codex")
+    :type summarizer: str
+    :param codex_bin: Path to the Codex binary
+    :type codex_bin: str
+    :return: (result, None, seconds) on success, (None, error message, seconds) on failure
+    :rtype: tuple[dict[str, Any] | None, str | None, float]
+    """
+    t_ent0 = time.time()
+    try:
+        result = summarize_entity_routed(
+            kind=e["kind"],
+            fqname=e["fqname"],
+            signature=e["signature"] or "",
+            docstring=e["docstring"] or "",
+            code=code,
+            mode=summarizer,
+            codex_bin=codex_bin,
+        )
+        if not result["summary"].strip():
+            raise RuntimeError("Empty summary from Ollama")
+        return result, None, time.time() - t_ent0
+    except Exception as ex:
+        return None, str(ex), time.time() - t_ent0
+
+
+def _write_result(con: sqlite3.Connection, e: sqlite3.Row, result: dict[str, Any] | None, err: str | None) -> None:
+    """
+    Write one summarization outcome (summary or error). The caller commits.
+
+    :param con: SQLite connection object
+    :type con: sqlite3.Connection
+    :param e: Entity row the result belongs to
+    :type e: sqlite3.Row
+    :param result: Summarizer result, or None if it failed
+    :type result: dict[str, Any] | None
+    :param err: Error message if the summarizer failed
+    :type err: str | None
+    """
+    try:
+        if result is None:
+            raise RuntimeError(err)
+        write_summary_cur(
+            con,
+            e["id"],
+            result["summary"],
+            code_hash=e["code_hash"],
+            was_truncated=result["was_truncated"],
+            approx_tokens=result["approx_tokens"],
+            coverage=result["coverage"],
+            summary_backend=result["backend"],
+        )
+    except Exception as ex:
+        write_summary_error_cur(con, e["id"], str(ex))
+        print(f"  -> ERROR: {ex}", flush=True)
+
+
 def run_summarize(db: Path, limit: int = 200, summarizer: str = "auto", codex_bin: str = "codex") -> int:
     """
     This is the main entry point for summarization. It finds entities that need summaries, generates them, and writes back to the DB.
+    Snippets are read from each row's file range (no per-entity DB lookup), prefetched on an I/O thread, and summarizer calls run in up to :func:`_summarize_concurrency`
+    threads; all DB writes stay on the calling thread. A snippet that cannot be read is recorded as that entity's summary_error.
     
     :param db: Path to the SQLite database file
     :type db: Path
@@ -84,86 +185,101 @@ def run_summarize(db: Path, limit: int = 200, summarizer: str = "auto", codex_bi
     :return: Number of entities summarized
     :rtype: int
     """
+    source_root = os.environ.get("CONTEXT6_SOURCE_ROOT")
+    if not source_root:
+        print("Set CONTEXT6_SOURCE_ROOT=/path/to/ARC")
+        return 0
+    root = Path(source_root)
+
     todo = get_entities_needing_summary(db, kinds=["module", "class", "function", "method"], limit=limit)
     total = len(todo)
     if total == 0:
         print("Nothing to summarize.")
         return 0
 
-    con = sqlite3.connect(str(db))
+    workers = _summarize_concurrency()
+    con = get_conn(db)
+    ex = ThreadPoolExecutor(max_workers=workers)
+    # Snippet reads run one step ahead on their own thread, hidden under summarizer latency
+    io = ThreadPoolExecutor(max_workers=1)
+    prefetch: deque[tuple[int, sqlite3.Row, Future]] = deque()
+    upcoming = enumerate(todo, start=1)
+    pending: dict[Future, tuple[int, sqlite3.Row]] = {}
+    n = 0
+    # Writes since the last commit
+    uncommitted = 0
     try:
-        # Good practice for concurrent readers (e.g., you inspecting with sqlite3)
-        con.execute("PRAGMA journal_mode=WAL;")
-
-        n = 0
         t0 = time.time()
+        last_commit = t0
 
-        for i, e in enumerate(todo, start=1):
-            fq = e["fqname"]
-            kind = e["kind"]
-            print(f"[{i}/{total}] {kind:7s} {fq}", flush=True)
+        def record(e: sqlite3.Row, result: dict[str, Any] | None, err: str | None) -> None:
+            nonlocal n, uncommitted, last_commit
+            _write_result(con, e, result, err)
+            n += 1
+            uncommitted += 1
+            if uncommitted >= COMMIT_EVERY or time.time() - last_commit >= COMMIT_INTERVAL_S:
+                con.commit()
+                uncommitted = 0
+                last_commit = time.time()
 
-            snip = get_snippet(db, fq)
-            if "text" not in snip:
-                print(f"  -> skipped (no snippet): {snip.get('error','unknown')}", flush=True)
-                continue
+        def collect(futures: Iterable[Future]) -> None:
+            for fut in futures:
+                i, e = pending.pop(fut)
+                result, err, dt = fut.result()
+                record(e, result, err)
 
-            t_ent0 = time.time()
-            try:
-                result = summarize_entity_routed(
-                    kind=kind,
-                    fqname=fq,
-                    signature=e.get("signature") or "",
-                    docstring=e.get("docstring") or "",
-                    code=snip["text"],
-                    mode=summarizer,
-                    codex_bin=codex_bin,
-                )
-
-                summary = result["summary"]
-                if not summary.strip():
-                    raise RuntimeError("Empty summary from Ollama")
-
-                write_summary_cur(
-                    con,
-                    e["id"],
-                    summary,
-                    code_hash=e["code_hash"],
-                    was_truncated=result["was_truncated"],
-                    approx_tokens=result["approx_tokens"],
-                    coverage=result["coverage"],
-                    summary_backend=result["backend"],
-                )
-
-            except Exception as ex:
-                write_summary_error_cur(con, e["id"], str(ex))
-                print(f"  -> ERROR: {ex}", flush=True)
-
-            finally:
-                con.commit()
+                elapsed = time.time() - t0
+                avg = elapsed / max(1, n)
+                remain = (total - i) * avg
+                print(f"  -> done in {dt:.1f}s | avg {avg:.1f}s/item | ~{remain/60:.1f} min left", flush=True)
 
-            n += 1
+        def fill_prefetch() -> None:
+            while len(prefetch) < 2 * workers:
+                nxt = next(upcoming, None)
+                if nxt is None:
+                    return
+                i, e = nxt
+                # The row already has file and line range: read the source without a DB lookup
+                prefetch.append((i, e, io.submit(entity_snippet, root, e)))
 
-            dt = time.time() - t_ent0
-            elapsed = time.time() - t0
-            avg = elapsed / max(1, n)
-            remain = (total - i) * avg
-            print(f"  -> done in {dt:.1f}s | avg {avg:.1f}s/item | ~{remain/60:.1f} min left", flush=True)
+        fill_prefetch()
+        while prefetch:
+            i, e, snip_fut = prefetch.popleft()
+            fill_prefetch()
+            print(f"[{i}/{total}] {e['kind']:7s} {e['fqname']}", flush=True)
+
+            try:
+                code = snip_fut.result()["text"]
+            except (OSError, ValueError) as read_err:
+                # Missing or unreadable source: record it on this entity and go on with the rest
+                record(e, None, f"Cannot read snippet: {read_err}")
+                continue
+            pending[ex.submit(_summarize_task, e, code, summarizer, codex_bin)] = (i, e)
+            if len(pending) >= workers:
+                # Keep at most `workers` requests in flight
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        collect(as_completed(list(pending)))
 
         print(f"Summarized {n}/{total} entities in {(time.time()-t0)/60:.1f} min")
         return n
 
     except KeyboardInterrupt:
-        con.commit()
         print("\nInterrupted; progress saved.", flush=True)
         return n
 
     finally:
-        con.close()
+        ex.shutdown(wait=False, cancel_futures=True)
+        io.shutdown(wait=False, cancel_futures=True)
+        # Flush the last partial batch, whatever ended the run (the shared connection stays open).
+        # A run that wrote nothing has nothing to commit.
+        if uncommitted:
+            con.commit()
 
 
-def summarize_one(db: Path, entity_id: int, fqname: str, kind: str, signature: str, docstring: str, summarizer: str = "auto", codex_bin: str = "codex") -> str:
-    snip = get_snippet(db, fqname)
+def summarize_one(db: Path, entity_id: int, fqname: str, kind: str, signature: str, docstring: str, summarizer: str = "auto", codex_bin: str = "codex", code_hash: str | None = None, source_root: Path | None = None) -> str:
+    snip = get_snippet(db, fqname, source_root=source_root)
     if "text" not in snip:
         raise RuntimeError(f"Cannot summarize {fqname}: no snippet ({snip.get('error','unknown')})")
 
@@ -180,15 +296,17 @@ def summarize_one(db: Path, entity_id: int, fqname: str, kind: str, signature: s
     if not summary.strip():
         raise RuntimeError(f"Ollama returned empty summary for {fqname}")
 
-    # get code_hash from DB (source of truth)
-    con = _connect(db)
-    try:
+    con = get_conn(db)
+    if code_hash is None:
+        # get code_hash from DB (source of truth)
         row = con.execute("SELECT code_hash FROM entities WHERE id=?", (entity_id,)).fetchone()
         if not row:
             raise RuntimeError(f"Entity id not found: {entity_id}")
         code_hash = row["code_hash"]
 
-        write_summary_cur(
+    # Shared connection: commit on success, roll back on error so nothing is left pending
+    with con:
+        written = write_summary_cur(
             con,
             entity_id,
             summary,
@@ -198,18 +316,10 @@ def summarize_one(db: Path, entity_id: int, fqname: str, kind: str, signature: s
             coverage=result["coverage"],
             summary_backend=result["backend"],
         )
-        con.commit()
-
-        row2 = con.execute(
-            "SELECT length(summary) AS n, summary_coverage, summary_prompt_tokens FROM entities WHERE id=?",
-            (entity_id,),
-        ).fetchone()
-        print(
-            f"DB verify: summary_len={row2['n']} coverage={row2['summary_coverage']} tokens={row2['summary_prompt_tokens']}",
-            flush=True,
-        )
 
-    finally:
-        con.close()
+    print(
+        f"DB verify: summary_len={written[0]} coverage={written[1]} tokens={written[2]}",
+        flush=True,
+    )
 
     return summary
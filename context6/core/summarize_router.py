@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Any
 
-from context6.core.ollama_summarizer import summarize_entity as summarize_entity_ollama
+from context6.core.ollama_summarizer import summarize_entity as summarize_entity_ollama, would_truncate
 from context6.core.codex_summarizer import summmarize_entity_codex
 
 def summarize_entity_routed(kind: str,
@@ -15,7 +15,7 @@ def summarize_entity_routed(kind: str,
 ) -> dict[str, Any]:
     """
     A function to summarize a code entity, routing between different summarization backends based on the specified mode and the characteristics of the input. 
-    The function supports an "auto" mode that tries Ollama first and falls back to Codex if the result is truncated, 
+    The function supports an "auto" mode that uses Ollama unless the code would be truncated to fit its context, in which case Codex is used directly, 
         as well as explicit "ollama" and "codex" modes for direct control over the summarization backend.
     
     :param kind: The kind of code entity being summarized (e.g., "class", "function", "method")
@@ -28,9 +28,9 @@ def summarize_entity_routed(kind: str,
     :type docstring: str
     :param code: The code snippet of the entity to be summarized, which may be truncated if it exceeds certain length limits for the summarization backend
     :type code: str
-    :param mode: The summarization mode to use, which can be "auto" (try Ollama and fall back to Codex if truncated), "ollama" (use Ollama directly), or "codex" (use Codex directly)
+    :param mode: The summarization mode to use, which can be "auto" (Ollama, or Codex when the code would not fit Ollama's context), "ollama" (use Ollama directly), or "codex" (use Codex directly)
     :type mode: str
-    :param codex_bin: The path to the Codex binary, used when the mode is set to "codex" or when falling back to Codex in "auto" mode
+    :param codex_bin: The path to the Codex binary, used when the mode is set to "codex" or when routing to Codex in "auto" mode
     :type codex_bin: str
     :return: A dictionary containing the summary of the code entity, along with metadata about the summarization process such as whether truncation occurred, the approximate token count, coverage level, and which backend was used for summarization 
     :rtype: dict[str, Any]
@@ -46,15 +46,16 @@ def summarize_entity_routed(kind: str,
         return res
     elif mode == "ollama":
         res = summarize_entity_ollama(kind, fqname, signature, docstring, code, stream=False)
-        res["backend"] = "ollam"
+        res["backend"] = "ollama"
         return res
-    
 
-    res = summarize_entity_ollama(kind, fqname, signature, docstring, code)
-    if res.get("was_truncated"):
+    # Code that would not fit Ollama's context goes straight to codex (which sees all of it)
+    # instead of paying for a truncated Ollama summary first
+    if would_truncate(kind, fqname, signature, docstring, code):
         res = summmarize_entity_codex(kind, fqname, signature, docstring, code, codex_bin=codex_bin)
         res["backend"] = "codex"
         return res
-    res["backend"] = "ollam"
-    
+
+    res = summarize_entity_ollama(kind, fqname, signature, docstring, code)
+    res["backend"] = "ollama"
     return res
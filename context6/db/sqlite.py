@@ -1,8 +1,32 @@
 from __future__ import annotations
+from collections import OrderedDict
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Any, List, Dict
 
+# Keep the external-content FTS index in sync row by row, so ingest and summary writes
+# only touch changed entities instead of rebuilding the whole index.
+FTS_TRIGGER_STATEMENTS = (
+    """CREATE TRIGGER IF NOT EXISTS entities_ai AFTER INSERT ON entities BEGIN
+    INSERT INTO entities_fts(rowid, fqname, signature, docstring, summary)
+    VALUES (new.id, new.fqname, new.signature, new.docstring, new.summary);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS entities_ad AFTER DELETE ON entities BEGIN
+    INSERT INTO entities_fts(entities_fts, rowid, fqname, signature, docstring, summary)
+    VALUES ('delete', old.id, old.fqname, old.signature, old.docstring, old.summary);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS entities_au AFTER UPDATE OF fqname, signature, docstring, summary ON entities BEGIN
+    INSERT INTO entities_fts(entities_fts, rowid, fqname, signature, docstring, summary)
+    VALUES ('delete', old.id, old.fqname, old.signature, old.docstring, old.summary);
+    INSERT INTO entities_fts(rowid, fqname, signature, docstring, summary)
+    VALUES (new.id, new.fqname, new.signature, new.docstring, new.summary);
+END""",
+)
+FTS_TRIGGER_NAMES = ("entities_ai", "entities_ad", "entities_au")
+FTS_TRIGGERS = "".join(f"\n{stmt};\n" for stmt in FTS_TRIGGER_STATEMENTS)
+
+
 SCHEMA = """
 PRAGMA journal_mode=WAL;
 
@@ -21,7 +45,7 @@ CREATE TABLE IF NOT EXISTS entities (
     code_truncated INTEGER DEFAULT 0,
     summary_prompt_tokens INTEGER,
     summary_coverage TEXT,
-    summary_backend TEXT CHECK (summary_backend IN ('ollam', 'codex') OR summary_backend IS NULL),
+    summary_backend TEXT CHECK (summary_backend IN ('ollama', 'codex') OR summary_backend IS NULL),
     summary_error TEXT,
 
     code_hash TEXT NOT NULL,
@@ -29,6 +53,15 @@ CREATE TABLE IF NOT EXISTS entities (
     UNIQUE(kind, fqname)
 );
 
+CREATE INDEX IF NOT EXISTS idx_entities_fqname ON entities(fqname);
+-- module_neighbors: all entities of one file, in line order
+CREATE INDEX IF NOT EXISTS idx_entities_file_line ON entities(file, start_line);
+
+-- Partial index of rows get_entities_needing_summary can return, in its ORDER BY order.
+-- Its WHERE must stay term-for-term identical to the query's for the planner to use it.
+CREATE INDEX IF NOT EXISTS idx_entities_unsummarized ON entities(kind, fqname)
+    WHERE (summary IS NULL OR summary = '') AND summary_hash IS NOT code_hash;
+
 CREATE TABLE IF NOT EXISTS relations (
     id INTEGER PRIMARY KEY,
     src TEXT NOT NULL,
@@ -45,66 +78,317 @@ USING fts5(
     content='entities',
     content_rowid='id'
 );
-"""
+
+-- build_index(cache_db=...): each file's pickled (entities, relations), reused while
+-- its mtime and size are unchanged
+CREATE TABLE IF NOT EXISTS ast_cache (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (root, path)
+);
+""" + FTS_TRIGGERS
+
+
+# FTS5 ranking function (fqname, signature, docstring, summary weights): a hit in the name
+# or signature counts for more than prose mentions. Stored in the index config so queries
+# can ORDER BY the ``rank`` column instead of calling bm25().
+FTS_RANK = "bm25(10.0, 5.0, 1.0, 1.0)"
+
+
+# sqlite3's per-connection prepared statement cache size (its default, made explicit)
+_CACHED_STATEMENTS = 128
 
 
 def _connect(db_path: Path) -> sqlite3.Connection:
-    conn = sqlite3.connect(str(db_path))
+    """
+    Open a read/write connection with the baseline pragmas applied once, at open:
+    8 KiB pages for a database created through it (e.g. by :func:`init_db`; a no-op once the file
+    has content), WAL (concurrent readers don't block the writer), synchronous=NORMAL (safe under WAL),
+    a 5 s busy timeout, in-memory temp b-trees, mmap, a 64 MB page cache and a ~6 MB cap on
+    the WAL file left behind after checkpoints.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :return: SQLite connection object (``sqlite3.Row`` rows)
+    :rtype: sqlite3.Connection
+    """
+    conn = sqlite3.connect(str(db_path), timeout=5.0, cached_statements=_CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
+    # page_size must come first: switching an empty database to WAL fixes its page size
+    conn.executescript(
+        "PRAGMA page_size=8192; PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=5000; "
+        "PRAGMA temp_store=MEMORY; PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536; "
+        "PRAGMA journal_size_limit=6144000;"
+    )
     return conn
 
 
+_MAX_SHARED_CONNECTIONS = 8
+_local = threading.local()
+
+
+def get_conn(db_path: Path) -> sqlite3.Connection:
+    """
+    Return this thread's long-lived read/write connection to the database (see :func:`_connect`),
+    opening it on first use. Callers must not close it; the least recently used one is closed once more
+    than _MAX_SHARED_CONNECTIONS databases are open in a thread.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :return: SQLite connection object (``sqlite3.Row`` rows)
+    :rtype: sqlite3.Connection
+    """
+    cache: OrderedDict[str, sqlite3.Connection] | None = getattr(_local, "conns", None)
+    if cache is None:
+        cache = _local.conns = OrderedDict()
+    key = str(db_path)
+    conn = cache.get(key)
+    if conn is not None:
+        cache.move_to_end(key)
+        return conn
+
+    conn = _connect(db_path)
+    cache[key] = conn
+    if len(cache) > _MAX_SHARED_CONNECTIONS:
+        _, oldest = cache.popitem(last=False)
+        oldest.close()
+    return conn
+
+
+def close_shared_connections() -> None:
+    """
+    Close and forget this thread's :func:`get_conn` connections (e.g. before replacing a DB file).
+    """
+    cache = getattr(_local, "conns", None)
+    while cache:
+        _, conn = cache.popitem()
+        conn.close()
+
+
 def init_db(db_path: Path) -> None:
     conn = _connect(db_path)
     with conn:
+        # Databases created before the sync triggers only refreshed FTS at ingest time, so later
+        # summary writes never reached it; SCHEMA adds the triggers, then one rebuild catches up
+        needs_fts_rebuild = (
+            conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entities'").fetchone() is not None
+            and conn.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='entities_au'").fetchone() is None
+        )
         conn.executescript(SCHEMA)
         _ensure_schema_columns(conn)
+        if needs_fts_rebuild:
+            conn.execute("INSERT INTO entities_fts(entities_fts) VALUES('rebuild')")
+            conn.execute("INSERT INTO entities_fts(entities_fts) VALUES('optimize')")
+        _ensure_fts_rank(conn)
+
+
+def _ensure_fts_rank(conn: sqlite3.Connection) -> None:
+    """
+    Store FTS_RANK as entities_fts's ranking function. The setting lives in the FTS config
+    table and survives 'rebuild', so it is only written when missing or changed.
+
+    :param conn: Database connection
+    :type conn: sqlite3.Connection
+    """
+    row = conn.execute("SELECT v FROM entities_fts_config WHERE k = 'rank'").fetchone()
+    if row is None or row[0] != FTS_RANK:
+        conn.execute("INSERT INTO entities_fts(entities_fts, rank) VALUES('rank', ?)", (FTS_RANK,))
 
 
 def _ensure_schema_columns(conn: sqlite3.Connection) -> None:
     cols = {row["name"] for row in conn.execute("PRAGMA table_info(entities)").fetchall()}
     if "summary_backend" not in cols:
         conn.execute(
-            "ALTER TABLE entities ADD COLUMN summary_backend TEXT CHECK (summary_backend IN ('ollam', 'codex') OR summary_backend IS NULL)"
+            "ALTER TABLE entities ADD COLUMN summary_backend TEXT CHECK (summary_backend IN ('ollama', 'codex') OR summary_backend IS NULL)"
         )
+    else:
+        _fix_summary_backend_check(conn)
 
 
-def ingest_index(db_path: Path, idx: dict[str, Any]) -> None:
-    conn = _connect(db_path)
-    with conn:
-        # Relations: simplest is replace-all each run
-        conn.execute("DELETE FROM relations")
-        conn.executemany(
-            "INSERT INTO relations (src, rel, dst) VALUES (?, ?, ?)",
-            [(r["src"], r["rel"], r["dst"]) for r in idx["relations"]]
+def _fix_summary_backend_check(conn: sqlite3.Connection) -> None:
+    """
+    Older databases were created with a misspelled CHECK (summary_backend IN ('ollam', 'codex')),
+    which rejects every Ollama summary. CHECK constraints do not affect the on-disk format, so the
+    stored schema text is patched in place (SQLite's documented writable_schema procedure) instead
+    of rebuilding the table.
+
+    :param conn: Database connection
+    :type conn: sqlite3.Connection
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='entities'").fetchone()
+    if row is None or "'ollam'" not in row["sql"]:
+        return
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    conn.execute("PRAGMA writable_schema=ON")
+    try:
+        conn.execute(
+            "UPDATE sqlite_master SET sql = replace(sql, ?, ?) WHERE type='table' AND name='entities'",
+            ("'ollam'", "'ollama'"),
         )
+        conn.execute(f"PRAGMA schema_version={version + 1}")
+    finally:
+        conn.execute("PRAGMA writable_schema=OFF")
+    conn.execute("UPDATE entities SET summary_backend='ollama' WHERE summary_backend='ollam'")
+
+
+_UPSERT_ENTITY_SQL = """
+    INSERT INTO entities(kind, fqname, file, start_line, end_line, signature, docstring, summary, code_hash)
+    VALUES(?, ?, ?, ?, ?, ?, ?, COALESCE(?, ''), ?)
+    ON CONFLICT(kind, fqname) DO UPDATE SET
+        file=excluded.file,
+        start_line=excluded.start_line,
+        end_line=excluded.end_line,
+        signature=excluded.signature,
+        docstring=excluded.docstring,
+        code_hash=excluded.code_hash,
+        updated_at=datetime('now')
+    -- Unchanged rows are left alone: no page writes, no updated_at bump, no FTS trigger
+    WHERE entities.code_hash IS NOT excluded.code_hash
+       OR entities.signature IS NOT excluded.signature
+       OR entities.docstring IS NOT excluded.docstring
+       OR entities.file IS NOT excluded.file
+       OR entities.start_line IS NOT excluded.start_line
+       OR entities.end_line IS NOT excluded.end_line
+"""
+
+
+def ingest_index(db_path: Path, idx: dict[str, Any], *, conn: sqlite3.Connection | None = None) -> None:
+    """
+    Load a :func:`context6.core.indexer.build_index` result: relations are replaced, entities upserted.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :param idx: Index with "entities" and "relations" lists
+    :type idx: dict[str, Any]
+    :param conn: Optional open connection to load through. The caller owns its transaction
+                 (e.g. several ingests inside one ``with conn:``) and closes it; nothing is committed here.
+    :type conn: sqlite3.Connection | None
+    """
+    if conn is not None:
+        _ingest(conn, idx)
+        return
+
+    conn = _connect(db_path)
+    # Bulk load of a rebuildable index: skip fsyncs entirely (the rest comes from _connect)
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        # One transaction for the whole load
+        with conn:
+            _ingest(conn, idx)
+    finally:
+        conn.close()
+
+
+# Loads into an empty entities table with more rows than this skip the FTS triggers and
+# index everything with one 'rebuild' afterwards, instead of one FTS write per row.
+# Re-ingests keep the triggers: the upsert leaves unchanged rows alone, so they fire only
+# for changed ones, where a rebuild would re-tokenize every row.
+_BULK_FTS_MIN_ENTITIES = 100
+
+
+def _ingest(conn: sqlite3.Connection, idx: dict[str, Any]) -> None:
+    entities = idx["entities"]
+    bulk = (
+        len(entities) > _BULK_FTS_MIN_ENTITIES
+        and conn.execute("SELECT 1 FROM entities LIMIT 1").fetchone() is None
+    )
+    if bulk:
+        for name in FTS_TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    # Relations: simplest is replace-all each run
+    conn.execute("DELETE FROM relations")
+    conn.executemany(
+        "INSERT INTO relations (src, rel, dst) VALUES (?, ?, ?)",
+        ((r["src"], r["rel"], r["dst"]) for r in idx["relations"]),
+    )
+
+    # upsert entities; generators stream rows into executemany without an interim list
+    conn.executemany(
+        _UPSERT_ENTITY_SQL,
+        ((e["kind"], e["fqname"], e["file"], e["start_line"], e["end_line"],
+          e.get("signature",""), e.get("docstring",""), e.get("summary",""), e["code_hash"])
+         for e in entities),
+    )
 
-        for e in idx["entities"]:
-            # upsert entity
-            conn.execute("""
-            INSERT INTO entities(kind, fqname, file, start_line, end_line, signature, docstring, summary, code_hash)
-            VALUES(?, ?, ?, ?, ?, ?, ?, COALESCE(?, ''), ?)
-            ON CONFLICT(kind, fqname) DO UPDATE SET
-                file=excluded.file,
-                start_line=excluded.start_line,
-                end_line=excluded.end_line,
-                signature=excluded.signature,
-                docstring=excluded.docstring,
-                code_hash=excluded.code_hash,
-                updated_at=datetime('now')
-            """,                 
-            (e["kind"], e["fqname"], e["file"], e["start_line"], e["end_line"],
-                 e.get("signature",""), e.get("docstring",""), e.get("summary",""), e["code_hash"])
-            )
-
-        # rebuild fts (simple approach for MVP)
+    # Otherwise the triggers have already indexed changed rows. After a rebuild, merge its
+    # b-trees into one segment so each MATCH probes a single index (incremental writes rely
+    # on FTS5 automerge). Statements run one by one: executescript() would commit the
+    # caller's open transaction.
+    if bulk:
         conn.execute("INSERT INTO entities_fts(entities_fts) VALUES('rebuild')")
+        conn.execute("INSERT INTO entities_fts(entities_fts) VALUES('optimize')")
+        for stmt in FTS_TRIGGER_STATEMENTS:
+            conn.execute(stmt)
 
-def get_entities_needing_summary(db_path: Path, kinds=None, limit: int = 200):
-    con = sqlite3.connect(str(db_path))
-    con.row_factory = sqlite3.Row
+
+def load_ast_cache(db_path: Path, root: str) -> Dict[str, tuple[int, int, int, bytes]]:
+    """
+    Cached parse results of the files under one source root.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :param root: Resolved source root the paths are relative to
+    :type root: str
+    :return: Mapping of relative path to (mtime_ns, size, version, blob)
+    :rtype: dict[str, tuple[int, int, int, bytes]]
+    """
+    con = get_conn(db_path)
+    rows = con.execute("SELECT path, mtime_ns, size, version, blob FROM ast_cache WHERE root = ?", (root,))
+    return {r[0]: (r[1], r[2], r[3], r[4]) for r in rows}
+
+
+def update_ast_cache(db_path: Path, root: str, fresh: list[tuple[str, int, int, int, bytes]], current: list[str]) -> None:
+    """
+    Store newly parsed files and drop rows of files that no longer exist under the root.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :param root: Resolved source root the paths are relative to
+    :type root: str
+    :param fresh: (path, mtime_ns, size, version, blob) of each file parsed in this run
+    :type fresh: list[tuple[str, int, int, int, bytes]]
+    :param current: Relative paths of every file found in this run
+    :type current: list[str]
+    """
+    con = get_conn(db_path)
+    with con:
+        con.executemany(
+            "INSERT OR REPLACE INTO ast_cache(root, path, mtime_ns, size, version, blob) VALUES (?, ?, ?, ?, ?, ?)",
+            ((root, *row) for row in fresh),
+        )
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS ast_cache_current(path TEXT PRIMARY KEY)")
+        con.execute("DELETE FROM ast_cache_current")
+        con.executemany("INSERT OR IGNORE INTO ast_cache_current(path) VALUES (?)", ((p,) for p in current))
+        con.execute(
+            "DELETE FROM ast_cache WHERE root = ? AND path NOT IN (SELECT path FROM ast_cache_current)",
+            (root,),
+        )
+
+
+def get_entities_needing_summary(db_path: Path, kinds=None, limit: int = 200) -> List[sqlite3.Row]:
+    """
+    Entities that still need a summary, ordered by kind and fqname.
+    Rows are returned as ``sqlite3.Row`` (read with ``e["fqname"]``) instead of being copied into dicts.
+
+    :param db_path: Path to the SQLite database file
+    :type db_path: Path
+    :param kinds: Kinds to include (default: module, class, function, method)
+    :type kinds: list[str] | None
+    :param limit: Maximum number of rows
+    :type limit: int
+    :return: Entity rows
+    :rtype: list[sqlite3.Row]
+    """
+    con = get_conn(db_path)
     kinds = kinds or ["module", "class", "function", "method"]
 
+    # A row whose summary_hash already matches its code_hash was summarized for this exact
+    # code, so it is not sent back to the LLM; clear summary_hash to force a re-run.
     q = f"""
     SELECT
         id, kind, fqname, file, start_line, end_line,
@@ -112,17 +396,16 @@ def get_entities_needing_summary(db_path: Path, kinds=None, limit: int = 200):
         code_hash,
         summary, summary_hash, summary_error
     FROM entities
-    WHERE (summary IS NULL OR summary = '')
+    WHERE (summary IS NULL OR summary = '') AND summary_hash IS NOT code_hash
       AND kind IN ({",".join(["?"] * len(kinds))})
     ORDER BY kind, fqname
     LIMIT ?
     """
-    rows = con.execute(q, (*kinds, limit)).fetchall()
-    return [dict(r) for r in rows]
+    return con.execute(q, (*kinds, limit)).fetchall()
 
 
 def write_summary(db_path: Path, entity_id: int, summary: str) -> None:
-    con = sqlite3.connect(str(db_path))
+    con = get_conn(db_path)
     with con:
         con.execute(
             "UPDATE entities SET summary=?, updated_at=datetime('now') WHERE id=?",
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import os
 import sqlite3
 from dataclasses import dataclass
@@ -14,12 +15,11 @@ from context6.core.retrieve import (
     get_snippet,
     normalize_resolve_query,
     tiny_entity_snippet,
-    class_methods,
-    module_neighbors,
+    related_entities,
 )
 from context6.core.present import best_match_entity, pretty_lookup_entity
 from context6.core.summarize import summarize_one
-from context6.db.sqlite import _connect
+from context6.db.sqlite import get_conn
 
 
 
@@ -35,41 +35,67 @@ class cfg:
     codex_bin: str = "codex"
 
 
+_CFG_ENV_VARS = ("CONTEXT6_DB", "CONTEXT6_SOURCE_ROOT", "CONTEXT6_SUMMARIZER", "CONTEXT6_CODEX_BIN")
+
+
 def _cfg() -> cfg:
     """
     Load configuration from environment variables, with defaults. Validates that paths exist.
+    Parsed once per distinct set of variable values, so tool calls only read the environment.
 
     Returns:
         cfg: A cfg dataclass instance containing resolved configuration values for the database path, source root, summarizer choice, and codex binary.
     """
-    raw_db = os.environ.get("CONTEXT6_DB")
+    return _cfg_from_env(tuple(os.environ.get(k) for k in _CFG_ENV_VARS))
+
+
+@functools.lru_cache(maxsize=8)
+def _cfg_from_env(env: tuple[Optional[str], ...]) -> cfg:
+    """
+    Build the configuration from a snapshot of the variables in _CFG_ENV_VARS (in that order).
+
+    :param env: Values of CONTEXT6_DB, CONTEXT6_SOURCE_ROOT, CONTEXT6_SUMMARIZER, CONTEXT6_CODEX_BIN
+    :type env: tuple[Optional[str], ...]
+    :return: Resolved configuration
+    :rtype: cfg
+    """
+    raw_db, raw_root, summarizer, codex_bin = env
     if raw_db and raw_db.strip():
         db = Path(raw_db).expanduser()
     else:
         db = Path.home() / "code" / "context6" / "arc" / "context6.db"
 
-    raw_root = os.environ.get("CONTEXT6_SOURCE_ROOT")
     source_root = Path(raw_root).expanduser() if raw_root and raw_root.strip() else Path("")
 
     return cfg(db=db, 
                source_root=source_root, 
-               summarizer=os.environ.get("CONTEXT6_SUMMARIZER", "auto"),
-               codex_bin=os.environ.get("CONTEXT6_CODEX_BIN", "codex")
+               summarizer=summarizer if summarizer is not None else "auto",
+               codex_bin=codex_bin if codex_bin is not None else "codex",
     )
 
 
+# (db, source_root) pairs that already passed _require_paths in this process
+_validated_paths: set[tuple[Path, Path]] = set()
+
+
 def _require_paths(cfg):
     """
     Ensure that the paths specified in the configuration exist and are of the correct type.
+    Checked once per (db, source_root) pair per process.
 
     :param cfg: Configuration object containing paths to validate
     :type cfg: cfg
     """
 
-    if not cfg.db.exists() or not cfg.db.is_file():
+    key = (cfg.db, cfg.source_root)
+    if key in _validated_paths:
+        return
+    # is_file()/is_dir() are False for missing paths, so one stat each is enough
+    if not cfg.db.is_file():
         raise RuntimeError(f"DB not found or not a file: {cfg.db}")
-    if not cfg.source_root.exists() or not cfg.source_root.is_dir():
+    if not cfg.source_root.is_dir():
         raise RuntimeError(f"SOURCE_ROOT not found or not a dir: {cfg.source_root}")
+    _validated_paths.add(key)
 
 
 def _normalize_kinds(kinds: Optional[Union[str, list[str]]]) -> Optional[list[str]]:
@@ -148,18 +174,7 @@ def context6_snippet(
     cfg = _cfg()
     _require_paths(cfg)
 
-    # get_snippet already relies on CONTEXT6_SOURCE_ROOT internally
-    # so make sure env var is aligned with cfg.source_root
-    os.environ["CONTEXT6_SOURCE_ROOT"] = str(cfg.source_root)
-
-    out = get_snippet(cfg.db, fqname)
-    if "text" in out:
-        lines = out["text"].splitlines()
-        was_truncated = len(lines) > max_lines
-        out["text"] = "\n".join(lines[:max_lines])
-        out["was_truncated"] = was_truncated
-        out["line_count"] = len(lines)
-    return out
+    return get_snippet(cfg.db, fqname, max_lines=max_lines, source_root=cfg.source_root)
 
 
 @mcp.tool("context6_pretty_lookup")
@@ -178,9 +193,6 @@ def context6_pretty_lookup(
     if not e:
         return {"error": f"No matches for: {name}"}
 
-    # pretty_lookup_entity reads source files; keep env aligned
-    os.environ["CONTEXT6_SOURCE_ROOT"] = str(cfg.source_root)
-
     text = pretty_lookup_entity(cfg.db, cfg.source_root, e)
     return {"entity": e, "text": text}
 
@@ -196,14 +208,13 @@ def context6_summarize_entity(
     """
     cfg = _cfg()
     _require_paths(cfg)
-    os.environ["CONTEXT6_SOURCE_ROOT"] = str(cfg.source_root)
 
     e = best_match_entity(cfg.db, name, kinds=_normalize_kinds(kinds))
     if not e:
         return {"error": f"No matches for: {name}"}
 
-    # Only summarize if empty (you can add force=True later)
-    if (e.get("summary") or "").strip():
+    # Only summarize if empty and not already summarized for this code (you can add force=True later)
+    if (e.get("summary") or "").strip() or e.get("summary_hash") == e.get("code_hash"):
         return {"entity": e, "did_work": False}
 
     summarize_one(
@@ -215,15 +226,13 @@ def context6_summarize_entity(
         docstring=e.get("docstring") or "",
         summarizer=cfg.summarizer,
         codex_bin=cfg.codex_bin,
+        code_hash=e.get("code_hash"),
+        source_root=cfg.source_root,
     )
 
     # Re-fetch updated row
-    con = _connect(cfg.db)
-    try:
-        row = con.execute("SELECT * FROM entities WHERE id=?", (e["id"],)).fetchone()
-        return {"entity": dict(row) if row else e, "did_work": True}
-    finally:
-        con.close()
+    row = get_conn(cfg.db).execute("SELECT * FROM entities WHERE id=?", (e["id"],)).fetchone()
+    return {"entity": dict(row) if row else e, "did_work": True}
 
 
 @mcp.tool("context6_resolve")
@@ -254,20 +263,11 @@ def context6_resolve(query: str, limit_methods: int = 5) -> dict[str, Any]:
 
     tiny = tiny_entity_snippet(cfg.source_root, best, max_lines=10)
 
-    same_class: list[dict[str, Any]] = []
-    if best["kind"] == "class":
-        same_class = class_methods(cfg.db, best["fqname"], limit=max(1, limit_methods))
-    elif best["kind"] == "method" and "." in best["fqname"]:
-        owner = best["fqname"].rsplit(".", 1)[0]
-        same_class = class_methods(cfg.db, owner, limit=max(1, limit_methods))
-
-    neighbors = module_neighbors(
+    related = related_entities(
         cfg.db,
-        file=best["file"],
-        start_line=int(best["start_line"]),
-        end_line=int(best["end_line"]),
-        exclude_id=int(best["id"]),
-        limit=max(3, limit_methods),
+        best,
+        methods_limit=max(1, limit_methods),
+        neighbors_limit=max(3, limit_methods),
     )
 
     return {
@@ -283,10 +283,7 @@ def context6_resolve(query: str, limit_methods: int = 5) -> dict[str, Any]:
             "end_line": best["end_line"],
         },
         "snippet": tiny,
-        "related": {
-            "class_methods": same_class,
-            "module_neighbors": neighbors,
-        },
+        "related": related,
     }
 
 if __name__ == "__main__":
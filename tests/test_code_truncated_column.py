@@ -6,7 +6,7 @@ import unittest
 from pathlib import Path
 
 from context6.core.summarize import write_summary_cur
-from context6.db.sqlite import init_db
+from context6.db.sqlite import SCHEMA, init_db
 
 
 class TestCodeTruncatedColumn(unittest.TestCase):
@@ -94,6 +94,36 @@ class TestCodeTruncatedColumn(unittest.TestCase):
         self.assertEqual("full", row[4])
         self.assertEqual("codex", row[5])
 
+    def test_init_db_fixes_misspelled_backend_check(self) -> None:
+        """Databases created with the old `'ollam'` CHECK should accept `ollama` after init_db."""
+        legacy = Path(self.tmpdir.name) / "legacy.sqlite3"
+        con = sqlite3.connect(str(legacy))
+        try:
+            con.executescript(SCHEMA.replace("('ollama', 'codex')", "('ollam', 'codex')"))
+        finally:
+            con.close()
+
+        init_db(legacy)
+
+        con = sqlite3.connect(str(legacy))
+        try:
+            entity_id = self._insert_entity(con)
+            write_summary_cur(
+                con=con,
+                entity_id=entity_id,
+                summary="summary text",
+                code_hash="abc123",
+                was_truncated=False,
+                approx_tokens=10,
+                coverage="full",
+                summary_backend="ollama",
+            )
+            con.commit()
+            backend = con.execute("SELECT summary_backend FROM entities WHERE id=?", (entity_id,)).fetchone()[0]
+        finally:
+            con.close()
+        self.assertEqual("ollama", backend)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from context6.core import codex_summarizer as c
+
+
+class TestCodexSummarizer(unittest.TestCase):
+    """Tests for the Codex summarizer short-circuit paths."""
+
+    def test_tiny_undocumented_code_skips_codex(self) -> None:
+        """Tiny entities without a docstring should not spawn codex."""
+        with patch.object(c.subprocess, "run") as run:
+            out = c.summmarize_entity_codex(
+                kind="function",
+                fqname="pkg.f",
+                signature="f()",
+                docstring="",
+                code="def f():\n    return 1\n",
+                codex_bin="definitely-not-a-codex-binary",
+            )
+        run.assert_not_called()
+        self.assertEqual("partial", out["coverage"])
+        self.assertFalse(out["was_truncated"])
+        self.assertEqual("Coverage: partial", out["summary"].splitlines()[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,32 +5,37 @@ import sqlite3
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
-from context6.core.retrieve import get_snippet, lookup_symbol, search
-from context6.db.sqlite import get_entities_needing_summary, ingest_index, init_db
+from context6.core import retrieve
+from context6.core.retrieve import _MODULE_NEIGHBORS_SQL, _lookup_sql, get_snippet, lookup_symbol, search
+from context6.db.sqlite import FTS_RANK, close_shared_connections, get_entities_needing_summary, ingest_index, init_db, write_summary
 
 
 class TestDbAndRetrieve(unittest.TestCase):
     """Integration-style tests for DB ingestion and retrieval helpers."""
 
-    def setUp(self) -> None:
-        self.tmpdir = tempfile.TemporaryDirectory()
-        self.root = Path(self.tmpdir.name)
-        self.db = self.root / "context6.db"
-        self.src_root = self.root / "src"
-        self.src_root.mkdir(parents=True, exist_ok=True)
-        (self.src_root / "pkg").mkdir(parents=True, exist_ok=True)
-        (self.src_root / "pkg" / "mod.py").write_text(
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Ingest once into a template DB; each test gets its own copy, which is much
+        # cheaper than re-ingesting and keeps tests that write isolated
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.root = Path(cls.tmpdir.name)
+        cls.template_db = cls.root / "template.db"
+        cls.src_root = cls.root / "src"
+        cls.src_root.mkdir(parents=True, exist_ok=True)
+        (cls.src_root / "pkg").mkdir(parents=True, exist_ok=True)
+        (cls.src_root / "pkg" / "mod.py").write_text(
             "def fn(x):\n"
             "    return x + 1\n",
             encoding="utf-8",
         )
 
-        init_db(self.db)
+        init_db(cls.template_db)
         ingest_index(
-            self.db,
+            cls.template_db,
             {
-                "root": str(self.src_root),
+                "root": str(cls.src_root),
                 "entities": [
                     {
                         "kind": "function",
@@ -61,8 +66,23 @@ class TestDbAndRetrieve(unittest.TestCase):
             },
         )
 
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmpdir.cleanup()
+
+    def setUp(self) -> None:
+        self.db = self.root / f"{self._testMethodName}.db"
+        # The backup API also copies pages still in the template's WAL
+        src = sqlite3.connect(str(self.template_db))
+        dst = sqlite3.connect(str(self.db))
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
     def tearDown(self) -> None:
-        self.tmpdir.cleanup()
+        close_shared_connections()
 
     def test_get_entities_needing_summary_filters_empty(self) -> None:
         """Only entities with empty summaries should be returned for summarization."""
@@ -71,6 +91,26 @@ class TestDbAndRetrieve(unittest.TestCase):
         self.assertIn("pkg.mod.C", names)
         self.assertNotIn("pkg.mod.fn", names)
 
+    def test_get_entities_needing_summary_skips_current_summary_hash(self) -> None:
+        """Rows already summarized for their current code_hash are not queued again."""
+        con = sqlite3.connect(str(self.db))
+        try:
+            with con:
+                con.execute("UPDATE entities SET summary_hash = code_hash WHERE fqname = 'pkg.mod.C'")
+            plan = " ".join(
+                r[3] for r in con.execute(
+                    "EXPLAIN QUERY PLAN SELECT id FROM entities "
+                    "WHERE (summary IS NULL OR summary = '') AND summary_hash IS NOT code_hash "
+                    "AND kind IN (?) ORDER BY kind, fqname",
+                    ("class",),
+                )
+            )
+        finally:
+            con.close()
+        self.assertIn("idx_entities_unsummarized", plan)
+        names = {e["fqname"] for e in get_entities_needing_summary(self.db)}
+        self.assertNotIn("pkg.mod.C", names)
+
     def test_lookup_symbol_and_search(self) -> None:
         """Symbol lookup and FTS search should return expected indexed entities."""
         out = lookup_symbol(self.db, "fn")
@@ -84,12 +124,107 @@ class TestDbAndRetrieve(unittest.TestCase):
         res = search(self.db, "adds", kinds=["class"])
         self.assertEqual([], res["results"])
 
+    def test_fts_index_follows_entity_updates(self) -> None:
+        """Summary writes and re-ingests should reach the FTS index without a rebuild."""
+        con = sqlite3.connect(str(self.db))
+        try:
+            cid = con.execute("SELECT id FROM entities WHERE fqname = 'pkg.mod.C'").fetchone()[0]
+        finally:
+            con.close()
+        write_summary(self.db, cid, "frobnicates widgets")
+        self.assertEqual(["pkg.mod.C"], [r["fqname"] for r in search(self.db, "frobnicates", kinds=None)["results"]])
+
+        con = sqlite3.connect(str(self.db))
+        try:
+            con.execute("INSERT INTO entities_fts(entities_fts, rank) VALUES('integrity-check', 1)")
+        finally:
+            con.close()
+
+    def test_reingest_leaves_unchanged_entities_untouched(self) -> None:
+        """Re-ingesting identical entities should not rewrite their rows."""
+        con = sqlite3.connect(str(self.db))
+        try:
+            con.execute("UPDATE entities SET updated_at = 'marker'")
+            con.commit()
+            ingest_index(
+                self.db,
+                {
+                    "entities": [
+                        {
+                            "kind": "class",
+                            "fqname": "pkg.mod.C",
+                            "file": "pkg/mod.py",
+                            "start_line": 1,
+                            "end_line": 2,
+                            "signature": "class C",
+                            "docstring": "",
+                            "code_hash": "h2",
+                        },
+                        {
+                            "kind": "function",
+                            "fqname": "pkg.mod.fn",
+                            "file": "pkg/mod.py",
+                            "start_line": 1,
+                            "end_line": 3,
+                            "signature": "fn(x)",
+                            "docstring": "",
+                            "code_hash": "h1-changed",
+                        },
+                    ],
+                    "relations": [],
+                },
+            )
+            stamps = dict(con.execute("SELECT fqname, updated_at FROM entities").fetchall())
+        finally:
+            con.close()
+        self.assertEqual("marker", stamps["pkg.mod.C"])
+        self.assertNotEqual("marker", stamps["pkg.mod.fn"])
+
+    def test_search_quotes_invalid_fts_syntax(self) -> None:
+        """Queries FTS5 cannot parse should be searched as a literal phrase instead of raising."""
+        for query in ('adds?', 'adds one.', '"adds'):
+            res = search(self.db, query)
+            self.assertEqual(["pkg.mod.fn"], [r["fqname"] for r in res["results"]], query)
+
+    def test_search_retries_only_fts_query_errors(self) -> None:
+        """A MATCH parse error is retried once as a phrase; other OperationalErrors are raised at once."""
+        parse_error = sqlite3.OperationalError('fts5: syntax error near "adds"')
+        with patch.object(retrieve, "_query_dicts", side_effect=[parse_error, []]) as query:
+            self.assertEqual({"results": []}, search(self.db, "adds one"))
+        self.assertEqual(2, query.call_count)
+        self.assertEqual('"adds one"', query.call_args.args[2]["query"])
+
+        for message in ("database is locked", "no such table: entities_fts"):
+            with patch.object(retrieve, "_query_dicts", side_effect=sqlite3.OperationalError(message)) as query:
+                with self.assertRaisesRegex(sqlite3.OperationalError, message):
+                    search(self.db, "adds one")
+            self.assertEqual(1, query.call_count, message)
+
+    def test_lookup_with_kinds_uses_kind_index(self) -> None:
+        """Kind-filtered lookups should search the (kind, fqname) index rather than scan entities."""
+        params = {"name": "fn", "tail": "%.fn", "sub": "%fn%", "k0": "function", "k1": "class", "limit": 5}
+        with sqlite3.connect(str(self.db)) as con:
+            plan = " ".join(r[-1] for r in con.execute("EXPLAIN QUERY PLAN " + _lookup_sql(2), params))
+        self.assertIn("USING INDEX", plan)
+        self.assertNotIn("SCAN entities", plan)
+
+    def test_module_neighbors_uses_file_index(self) -> None:
+        """Neighbor queries should search the (file, start_line) index rather than scan entities."""
+        params = {"file": "pkg/mod.py", "exclude_id": None, "start_line": 1, "end_line": 2, "limit": 5}
+        with sqlite3.connect(str(self.db)) as con:
+            plan = " ".join(r[-1] for r in con.execute("EXPLAIN QUERY PLAN " + _MODULE_NEIGHBORS_SQL, params))
+        self.assertIn("idx_entities_file_line", plan)
+        self.assertNotIn("SCAN entities", plan)
+
     def test_get_snippet_requires_source_root(self) -> None:
-        """Snippet retrieval should fail with a clear error when source root is unset."""
+        """Snippet retrieval should fail with a clear error when source root is unset and not passed."""
         old = os.environ.pop("CONTEXT6_SOURCE_ROOT", None)
         try:
             res = get_snippet(self.db, "pkg.mod.fn")
             self.assertIn("Set CONTEXT6_SOURCE_ROOT", res["error"])
+
+            res = get_snippet(self.db, "pkg.mod.fn", source_root=self.src_root)
+            self.assertIn("def fn(x):", res["text"])
         finally:
             if old is not None:
                 os.environ["CONTEXT6_SOURCE_ROOT"] = old
@@ -102,6 +237,11 @@ class TestDbAndRetrieve(unittest.TestCase):
             res = get_snippet(self.db, "pkg.mod.fn")
             self.assertEqual("pkg.mod.fn", res["fqname"])
             self.assertIn("def fn(x):", res["text"])
+
+            head = get_snippet(self.db, "pkg.mod.fn", max_lines=1)
+            self.assertEqual("def fn(x):", head["text"])
+            self.assertTrue(head["was_truncated"])
+            self.assertEqual(2, head["line_count"])
         finally:
             if old is None:
                 os.environ.pop("CONTEXT6_SOURCE_ROOT", None)
@@ -115,45 +255,133 @@ class TestDbAndRetrieve(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             lookup_symbol(bad_db, "fn")
 
+    def _arc_entity(self, kind: str, fqname: str, signature: str, summary: str, code_hash: str) -> dict[str, object]:
+        return {
+            "kind": kind,
+            "fqname": fqname,
+            "file": "pkg/mod.py",
+            "start_line": 1,
+            "end_line": 2,
+            "signature": signature,
+            "docstring": "",
+            "summary": summary,
+            "code_hash": code_hash,
+        }
+
     def test_search_boosts_exact_symbol_shape(self) -> None:
         """Search should rank exact-symbol-like fqnames above broader substring matches."""
+        # Two ingests through one caller-owned connection commit together, once
+        conn = sqlite3.connect(self.db)
+        self.addCleanup(conn.close)
+        with conn:
+            ingest_index(
+                self.db,
+                {"root": str(self.src_root), "entities": [self._arc_entity("class", "arc.main.ARC", "class ARC", "main ARC class", "h3")], "relations": []},
+                conn=conn,
+            )
+            ingest_index(
+                self.db,
+                {"root": str(self.src_root), "entities": [self._arc_entity("method", "arc.main.ARC.execute", "execute(self)", "execute ARC run", "h4")], "relations": []},
+                conn=conn,
+            )
+
+        res = search(self.db, "ARC", limit=10, kinds=["class", "method", "module", "function"])
+        names = [r["fqname"] for r in res["results"]]
+        self.assertIn("arc.main.ARC", names)
+        self.assertIn("arc.main.ARC.execute", names)
+        self.assertLess(names.index("arc.main.ARC"), names.index("arc.main.ARC.execute"))
+
+    def test_ingest_index_with_conn_leaves_transaction_to_caller(self) -> None:
+        """With conn=, ingest_index should not commit: rolling back the caller's transaction undoes it."""
+        conn = sqlite3.connect(self.db)
+        self.addCleanup(conn.close)
+        with self.assertRaises(RuntimeError):
+            with conn:
+                ingest_index(
+                    self.db,
+                    {"root": str(self.src_root), "entities": [self._arc_entity("class", "arc.main.ARC", "class ARC", "", "h3")], "relations": []},
+                    conn=conn,
+                )
+                raise RuntimeError("abort")
+        self.assertEqual(0, conn.execute("SELECT COUNT(*) FROM entities WHERE fqname = 'arc.main.ARC'").fetchone()[0])
+
+    def test_bulk_ingest_into_empty_db_rebuilds_fts_and_restores_triggers(self) -> None:
+        """A large first load bypasses the FTS triggers, yet search and later trigger updates still work."""
+        db = self.root / "bulk.db"
+        init_db(db)
+        ents = [self._arc_entity("function", f"bulk.mod.f{i}", f"f{i}()", f"widget {i}", f"b{i}") for i in range(150)]
+        ingest_index(db, {"root": str(self.src_root), "entities": ents, "relations": []})
+
+        with sqlite3.connect(db) as conn:
+            triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+            rank = conn.execute("SELECT v FROM entities_fts_config WHERE k = 'rank'").fetchone()[0]
+        self.assertEqual({"entities_ai", "entities_ad", "entities_au"}, triggers)
+        self.assertEqual(FTS_RANK, rank)
+        self.assertEqual(10, len(search(db, "widget", limit=10, kinds=["function"])["results"]))
+
+        write_summary(db, 1, "reticulate splines")
+        self.assertEqual(["bulk.mod.f0"], [r["fqname"] for r in search(db, "reticulate", kinds=["function"])["results"]])
+
+    def test_init_db_uses_8k_pages_in_wal_mode(self) -> None:
+        """A new database should get 8 KiB pages even though it is switched to WAL at open."""
+        db = self.root / "pages.db"
+        init_db(db)
+        with sqlite3.connect(db) as conn:
+            self.assertEqual(8192, conn.execute("PRAGMA page_size").fetchone()[0])
+            self.assertEqual("wal", conn.execute("PRAGMA journal_mode").fetchone()[0])
+
+    def test_init_db_rebuilds_fts_of_pre_trigger_database(self) -> None:
+        """Upgrading a trigger-less DB whose summaries never reached FTS should reindex it once."""
+        db = self.root / "upgrade.db"
+        init_db(db)
+        fixture = {"root": str(self.src_root), "entities": [self._arc_entity("function", "pkg.up.f", "f()", "", "u1")], "relations": []}
+        ingest_index(db, fixture)
+        # Older databases had no sync triggers and rebuilt FTS only at ingest time
+        with sqlite3.connect(db) as conn:
+            for name in ("entities_ai", "entities_ad", "entities_au"):
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute("UPDATE entities SET summary = 'frobnicates widgets' WHERE fqname = 'pkg.up.f'")
+        self.assertEqual([], search(db, "frobnicates", kinds=["function"])["results"])
+
+        init_db(db)
+        ingest_index(db, fixture)
+
+        self.assertEqual(["pkg.up.f"], [r["fqname"] for r in search(db, "frobnicates", kinds=["function"])["results"]])
+        with sqlite3.connect(db) as conn:
+            conn.execute("INSERT INTO entities_fts(entities_fts) VALUES('integrity-check')")
+            triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+        self.assertEqual({"entities_ai", "entities_ad", "entities_au"}, triggers)
+
+    def test_search_weights_name_matches_above_summary_matches(self) -> None:
+        """bm25 column weights should rank a name hit above repeated mentions in a summary."""
+        def entity(fqname: str, docstring: str, summary: str, code_hash: str) -> dict[str, object]:
+            return {
+                "kind": "function",
+                "fqname": fqname,
+                "file": "pkg/mod.py",
+                "start_line": 1,
+                "end_line": 2,
+                "signature": "f()",
+                "docstring": docstring,
+                "summary": summary,
+                "code_hash": code_hash,
+            }
+
         ingest_index(
             self.db,
             {
                 "root": str(self.src_root),
                 "entities": [
-                    {
-                        "kind": "class",
-                        "fqname": "arc.main.ARC",
-                        "file": "pkg/mod.py",
-                        "start_line": 1,
-                        "end_line": 2,
-                        "signature": "class ARC",
-                        "docstring": "",
-                        "summary": "main ARC class",
-                        "code_hash": "h3",
-                    },
-                    {
-                        "kind": "method",
-                        "fqname": "arc.main.ARC.execute",
-                        "file": "pkg/mod.py",
-                        "start_line": 1,
-                        "end_line": 2,
-                        "signature": "execute(self)",
-                        "docstring": "",
-                        "summary": "execute ARC run",
-                        "code_hash": "h4",
-                    },
+                    entity("pkg.tools.reticulate", "splines", "", "h5"),
+                    entity("pkg.tools.helper", "", "reticulate splines reticulate splines", "h6"),
                 ],
                 "relations": [],
             },
         )
 
-        res = search(self.db, "ARC", limit=10, kinds=["class", "method", "module", "function"])
+        res = search(self.db, "reticulate splines", kinds=["function"])
         names = [r["fqname"] for r in res["results"]]
-        self.assertIn("arc.main.ARC", names)
-        self.assertIn("arc.main.ARC.execute", names)
-        self.assertLess(names.index("arc.main.ARC"), names.index("arc.main.ARC.execute"))
+        self.assertEqual(["pkg.tools.reticulate", "pkg.tools.helper"], names)
 
 
 if __name__ == "__main__":
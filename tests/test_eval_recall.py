@@ -1,23 +1,26 @@
 from __future__ import annotations
 
+import sqlite3
 import tempfile
 import unittest
 from pathlib import Path
 
-from context6.core.eval import evaluate_recall_at_k
+from context6.core.eval import _connect_eval, evaluate_recall_at_k, load_qrels
 from context6.db.sqlite import ingest_index, init_db
 
 
 class TestEvalRecall(unittest.TestCase):
-    def setUp(self) -> None:
-        self.tmpdir = tempfile.TemporaryDirectory()
-        self.root = Path(self.tmpdir.name)
-        self.db = self.root / "context6.db"
-        init_db(self.db)
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Every test only reads the fixture, so build it once per class
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.root = Path(cls.tmpdir.name)
+        cls.db = cls.root / "context6.db"
+        init_db(cls.db)
         ingest_index(
-            self.db,
+            cls.db,
             {
-                "root": str(self.root),
+                "root": str(cls.root),
                 "entities": [
                     {
                         "kind": "function",
@@ -46,8 +49,9 @@ class TestEvalRecall(unittest.TestCase):
             },
         )
 
-    def tearDown(self) -> None:
-        self.tmpdir.cleanup()
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmpdir.cleanup()
 
     def test_recall_at_k_search(self) -> None:
         qrels = [
@@ -102,6 +106,28 @@ class TestEvalRecall(unittest.TestCase):
         self.assertAlmostEqual(1.0, out["recall_at_k"])
         self.assertTrue(out["warnings"])
 
+    def test_eval_connection_is_read_only(self) -> None:
+        """The evaluation connection should only read: no journal_mode switch, writes rejected."""
+        con = _connect_eval(self.db)
+        try:
+            self.assertEqual(1, con.execute("PRAGMA query_only").fetchone()[0])
+            with self.assertRaises(sqlite3.OperationalError):
+                con.execute("DELETE FROM entities")
+        finally:
+            con.close()
+
+    def test_load_qrels_jsonl_skips_blank_lines(self) -> None:
+        path = self.root / "qrels.jsonl"
+        path.write_text(
+            '{"query": "adds", "relevant": ["pkg.mod.fn"]}\n'
+            "\n"
+            '{"query": "container", "relevant": [{"fqname": "pkg.mod.C", "kind": "class"}]}\n',
+            encoding="utf-8",
+        )
+        rows = load_qrels(path)
+        self.assertEqual(["adds", "container"], [r["query"] for r in rows])
+        self.assertEqual({"pkg.mod.C": "class"}, rows[1]["relevant_kinds"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sqlite3
 import tempfile
 import unittest
 from pathlib import Path
@@ -49,6 +50,60 @@ class TestIndexer(unittest.TestCase):
         self.assertIn(("pkg.mod", "defines", "pkg.mod.A.m"), rels)
         self.assertIn(("pkg.mod", "defines", "pkg.mod.f"), rels)
 
+    def test_build_index_collects_nested_imports(self) -> None:
+        """Imports inside functions, try/except, if/else and with blocks should still be recorded."""
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            (root / "m.py").write_text(
+                "try:\n"
+                "    import a\n"
+                "except ImportError:\n"
+                "    import b\n"
+                "finally:\n"
+                "    import c\n"
+                "if a:\n"
+                "    pass\n"
+                "else:\n"
+                "    from d import x\n"
+                "def f():\n"
+                "    with open('p') as fh:\n"
+                "        import e\n",
+                encoding="utf-8",
+            )
+            idx = build_index(root)
+        imported = {r["dst"] for r in idx["relations"] if r["rel"] == "imports"}
+        self.assertEqual({"a", "b", "c", "d", "e"}, imported)
+
+    def test_build_index_ignores_definitions_under_module_level_blocks(self) -> None:
+        """Only direct children of the module become entities; defs under if/else/try do not."""
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            (root / "m.py").write_text(
+                "import sys\n"
+                "if sys.platform == 'win32':\n"
+                "    def f():\n"
+                "        return 1\n"
+                "else:\n"
+                "    def f():\n"
+                "        return 2\n"
+                "try:\n"
+                "    class C:\n"
+                "        def m(self):\n"
+                "            import json\n"
+                "except ImportError:\n"
+                "    pass\n"
+                "def g():\n"
+                "    return 3\n",
+                encoding="utf-8",
+            )
+            idx = build_index(root)
+        self.assertEqual(
+            [("module", "m"), ("function", "m.g")],
+            [(e["kind"], e["fqname"]) for e in idx["entities"]],
+        )
+        imported = {r["dst"] for r in idx["relations"] if r["rel"] == "imports"}
+        self.assertEqual({"sys", "json"}, imported)
+
     def test_build_index_skips_syntax_error_files(self) -> None:
         """Files with syntax errors should be skipped without producing output rows."""
         with tempfile.TemporaryDirectory() as td:
@@ -59,6 +114,64 @@ class TestIndexer(unittest.TestCase):
         self.assertEqual([], idx["entities"])
         self.assertEqual([], idx["relations"])
 
+    def test_build_index_skips_vendored_and_hidden_dirs(self) -> None:
+        """Files under venv/, build/, __pycache__/ and dot-directories should not be indexed."""
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            for rel in ("venv/a.py", "build/b.py", ".git/c.py", ".tox/d.py", "__pycache__/e.py", "pkg/ok.py"):
+                path = root / rel
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text("def f():\n    return 1\n", encoding="utf-8")
+            idx = build_index(root)
+        modules = {e["fqname"] for e in idx["entities"] if e["kind"] == "module"}
+        self.assertEqual({"pkg.ok"}, modules)
+
+    def test_build_index_parallel_matches_serial(self) -> None:
+        """Indexing through the process pool should produce the same output as the serial path."""
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            for i in range(80):
+                (root / f"m{i}.py").write_text(
+                    f"import os\n\nclass C{i}:\n    def m(self):\n        return {i}\n",
+                    encoding="utf-8",
+                )
+            serial = build_index(root, workers=1)
+            parallel = build_index(root, workers=2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(80 * 3, len(parallel["entities"]))
+
+    def test_build_index_cache_reparses_only_changed_files(self) -> None:
+        """With cache_db, unchanged files come from ast_cache; edited and deleted files are picked up."""
+        from unittest.mock import patch
+
+        from context6.core import indexer
+        from context6.db.sqlite import close_shared_connections, init_db
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            root.mkdir()
+            db = Path(td) / "c6.db"
+            init_db(db)
+            self.addCleanup(close_shared_connections)
+            for name in ("a", "b", "c"):
+                (root / f"{name}.py").write_text(f"def {name}():\n    return 1\n", encoding="utf-8")
+
+            first = build_index(root, workers=1, cache_db=db)
+            self.assertEqual(build_index(root, workers=1), first)
+
+            (root / "b.py").write_text("def b2():\n    return 22\n", encoding="utf-8")
+            (root / "c.py").unlink()
+            with patch.object(indexer, "_index_one", wraps=indexer._index_one) as spy:
+                second = build_index(root, workers=1, cache_db=db)
+            self.assertEqual(["b.py"], [c.args[1] for c in spy.call_args_list])
+            self.assertEqual(build_index(root, workers=1), second)
+            names = {e["fqname"] for e in second["entities"]}
+            self.assertEqual({"a", "a.a", "b", "b.b2"}, names)
+
+            with sqlite3.connect(db) as con:
+                paths = {r[0] for r in con.execute("SELECT path FROM ast_cache")}
+            self.assertEqual({"a.py", "b.py"}, paths)
+
 
 if __name__ == "__main__":
     unittest.main()
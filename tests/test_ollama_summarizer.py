@@ -11,15 +11,15 @@ class TestOllamaSummarizer(unittest.TestCase):
 
     def test_summarize_entity_sets_full_coverage_when_not_truncated(self) -> None:
         """When code is not truncated, final coverage should be forced to `full`."""
-        with patch.object(s, "_post_json", return_value={"response": "Purpose: test"}):
-            out = s.summarize_entity(
-                kind="function",
-                fqname="pkg.f",
-                signature="f()",
-                docstring="",
-                code="def f():\n    return 1\n",
-                stream=False,
-            )
+        out = s.summarize_entity(
+            kind="function",
+            fqname="pkg.f",
+            signature="f()",
+            docstring="",
+            code="def f():\n    return 1\n",
+            stream=False,
+            post=lambda url, payload: {"response": "Purpose: test"},
+        )
         self.assertIn("Purpose: test", out["summary"])
         self.assertTrue(out["summary"].splitlines()[-1].startswith("Coverage:"))
         self.assertEqual("full", out["coverage"])
@@ -28,9 +28,7 @@ class TestOllamaSummarizer(unittest.TestCase):
     def test_summarize_entity_forces_partial_on_truncation(self) -> None:
         """When code is truncated, final coverage should be forced to `partial`."""
         code = "x" * 3000
-        with patch.object(s, "BUDGET_CHARS", 2200), patch.object(
-            s, "_post_json", return_value={"response": "Purpose: test\nCoverage: full"}
-        ):
+        with patch.object(s, "BUDGET_CHARS", 2200):
             out = s.summarize_entity(
                 kind="function",
                 fqname="pkg.f",
@@ -38,6 +36,7 @@ class TestOllamaSummarizer(unittest.TestCase):
                 docstring="",
                 code=code,
                 stream=False,
+                post=lambda url, payload: {"response": "Purpose: test\nCoverage: full"},
             )
         self.assertTrue(out["was_truncated"])
         self.assertEqual("partial", out["coverage"])
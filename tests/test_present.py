@@ -30,7 +30,7 @@ class TestPresent(unittest.TestCase):
             "    def __init__(self, x):\n"
             "        self.x = x\n"
         )
-        hdr = _extract_init_header(text)
+        hdr = _extract_init_header(text.splitlines())
         self.assertIn("@dec1", hdr)
         self.assertIn("def __init__(self, x):", hdr)
 
@@ -3,25 +3,31 @@ from __future__ import annotations
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
+from context6.core import retrieve
 from context6.core.retrieve import (
     class_methods,
     module_neighbors,
+    module_neighbors_with_snippets,
     normalize_resolve_query,
+    related_entities,
     tiny_entity_snippet,
 )
 from context6.db.sqlite import ingest_index, init_db
 
 
 class TestResolve(unittest.TestCase):
-    def setUp(self) -> None:
-        self.tmpdir = tempfile.TemporaryDirectory()
-        self.root = Path(self.tmpdir.name)
-        self.db = self.root / "context6.db"
-        self.src_root = self.root / "src"
-        (self.src_root / "pkg").mkdir(parents=True, exist_ok=True)
-
-        (self.src_root / "pkg" / "mod.py").write_text(
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Every test only reads the fixture, so build it once per class
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.root = Path(cls.tmpdir.name)
+        cls.db = cls.root / "context6.db"
+        cls.src_root = cls.root / "src"
+        (cls.src_root / "pkg").mkdir(parents=True, exist_ok=True)
+
+        (cls.src_root / "pkg" / "mod.py").write_text(
             "class C:\n"
             "    \"\"\"Main class.\"\"\"\n"
             "\n"
@@ -42,11 +48,11 @@ class TestResolve(unittest.TestCase):
             encoding="utf-8",
         )
 
-        init_db(self.db)
+        init_db(cls.db)
         ingest_index(
-            self.db,
+            cls.db,
             {
-                "root": str(self.src_root),
+                "root": str(cls.src_root),
                 "entities": [
                     {
                         "kind": "class",
@@ -119,20 +125,30 @@ class TestResolve(unittest.TestCase):
             },
         )
 
-    def tearDown(self) -> None:
-        self.tmpdir.cleanup()
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmpdir.cleanup()
 
     def test_normalize_resolve_query_extracts_symbol(self) -> None:
         parsed = normalize_resolve_query("from pkg.mod import C")
         self.assertIn("C", parsed["candidates"])
         self.assertIn("pkg.mod.C", parsed["candidates"])
 
+    def test_normalize_resolve_query_strips_punctuation_around_dotted_names(self) -> None:
+        parsed = normalize_resolve_query("see `pkg.mod.C.get_x()`, then (pkg.mod.nearby)")
+        for cand in ("pkg.mod.C.get_x", "get_x", "C.get_x", "pkg.mod.nearby", "nearby"):
+            self.assertIn(cand, parsed["candidates"])
+
     def test_class_methods_prefers_common_entrypoints(self) -> None:
         rows = class_methods(self.db, "pkg.mod.C", limit=3)
         names = [r["fqname"] for r in rows]
         self.assertEqual("pkg.mod.C.__init__", names[0])
         self.assertIn("pkg.mod.C.get_x", names)
 
+    def test_class_methods_matches_class_prefix_exactly(self) -> None:
+        self.assertEqual([], class_methods(self.db, "pkg.mod.c"))
+        self.assertEqual([], class_methods(self.db, "pkg.mod"))
+
     def test_module_neighbors_prefers_nearby_symbols(self) -> None:
         rows = module_neighbors(
             self.db,
@@ -145,6 +161,40 @@ class TestResolve(unittest.TestCase):
         names = [r["fqname"] for r in rows]
         self.assertIn("pkg.mod.nearby", names)
 
+    def test_related_entities_matches_separate_queries(self) -> None:
+        method = dict(class_methods(self.db, "pkg.mod.C", limit=5)[1])
+        related = related_entities(self.db, method, methods_limit=2, neighbors_limit=3)
+        self.assertEqual(class_methods(self.db, "pkg.mod.C", limit=2), related["class_methods"])
+        self.assertEqual(
+            module_neighbors(
+                self.db,
+                file=method["file"],
+                start_line=method["start_line"],
+                end_line=method["end_line"],
+                exclude_id=method["id"],
+                limit=3,
+            ),
+            related["module_neighbors"],
+        )
+
+        func = next(r for r in related["module_neighbors"] if r["fqname"] == "pkg.mod.nearby")
+        self.assertEqual([], related_entities(self.db, func)["class_methods"])
+
+    def test_module_neighbors_with_snippets_attaches_text(self) -> None:
+        rows = module_neighbors_with_snippets(
+            self.db,
+            self.src_root,
+            file="pkg/mod.py",
+            start_line=1,
+            end_line=11,
+            exclude_id=1,
+            limit=2,
+            max_lines=1,
+        )
+        by_name = {r["fqname"]: r for r in rows}
+        self.assertIn("pkg.mod.nearby", by_name)
+        self.assertEqual("def nearby():", by_name["pkg.mod.nearby"]["snippet"]["text"])
+
     def test_tiny_entity_snippet_returns_short_window(self) -> None:
         entity = {
             "file": "pkg/mod.py",
@@ -155,6 +205,26 @@ class TestResolve(unittest.TestCase):
         self.assertEqual(3, out["end_line"])
         self.assertIn("class C:", out["text"])
 
+    def test_tiny_entity_snippet_mmap_path_matches_cached_lines(self) -> None:
+        entity = {"file": "pkg/mod.py", "start_line": 4}
+        expected = tiny_entity_snippet(self.src_root, entity, max_lines=20)
+        with patch.object(retrieve, "_MMAP_MIN_BYTES", 1):
+            via_mmap = tiny_entity_snippet(self.src_root, entity, max_lines=20)
+        self.assertEqual(expected, via_mmap)
+        self.assertEqual("    def __init__(self, x):", via_mmap["text"].splitlines()[0])
+
+    def test_tiny_entity_snippet_rereads_edited_file(self) -> None:
+        # Edit a copy so the shared fixture file stays intact for the other tests
+        edited = self.src_root / "pkg" / "edited.py"
+        edited.write_text((self.src_root / "pkg" / "mod.py").read_text(encoding="utf-8"), encoding="utf-8")
+        entity = {"file": "pkg/edited.py", "start_line": 1}
+        first = tiny_entity_snippet(self.src_root, entity, max_lines=1)
+        self.assertEqual("class C:", first["text"])
+        edited.write_text("class Renamed:\n    pass\n", encoding="utf-8")
+        second = tiny_entity_snippet(self.src_root, entity, max_lines=5)
+        self.assertEqual("class Renamed:\n    pass", second["text"])
+        self.assertEqual(2, second["end_line"])
+
 
 if __name__ == "__main__":
     unittest.main()
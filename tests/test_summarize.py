@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from context6.core import summarize as s
+from context6.core import summarize_router as router
+from context6.core.retrieve import close_cached_connections
+from context6.db.sqlite import close_shared_connections, ingest_index, init_db
+
+
+class TestRunSummarize(unittest.TestCase):
+    """Tests for the summarize driver loop and its DB write path."""
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        root = Path(self.tmpdir.name)
+        self.db = root / "context6.db"
+        self.src = src = root / "src"
+        (src / "pkg").mkdir(parents=True)
+        (src / "pkg" / "mod.py").write_text(
+            "".join(f"def f{i}():\n    return {i}\n" for i in range(6)),
+            encoding="utf-8",
+        )
+        init_db(self.db)
+        ingest_index(
+            self.db,
+            {
+                "root": str(src),
+                "entities": [
+                    {
+                        "kind": "function",
+                        "fqname": f"pkg.mod.f{i}",
+                        "file": "pkg/mod.py",
+                        "start_line": 2 * i + 1,
+                        "end_line": 2 * i + 2,
+                        "signature": f"f{i}()",
+                        "docstring": "",
+                        "summary": "",
+                        "code_hash": f"h{i}",
+                    }
+                    for i in range(6)
+                ],
+                "relations": [],
+            },
+        )
+
+    def tearDown(self) -> None:
+        close_cached_connections()
+        close_shared_connections()
+        self.tmpdir.cleanup()
+
+    def test_run_summarize_concurrent_writes_every_result(self) -> None:
+        """With several workers every entity should get its own summary or error recorded."""
+
+        def fake_routed(**kw: object) -> dict[str, object]:
+            if kw["fqname"] == "pkg.mod.f3":
+                raise RuntimeError("backend down")
+            return {
+                "summary": f"Purpose: {kw['fqname']}\nCoverage: full",
+                "was_truncated": False,
+                "approx_tokens": 10,
+                "coverage": "full",
+                "backend": "codex",
+            }
+
+        with patch.dict(os.environ, {"CONTEXT6_CONCURRENCY": "3", "CONTEXT6_SOURCE_ROOT": str(self.src)}), \
+                patch.object(s, "summarize_entity_routed", side_effect=fake_routed), \
+                patch("builtins.print"):
+            n = s.run_summarize(self.db, limit=10)
+
+        self.assertEqual(6, n)
+        con = sqlite3.connect(str(self.db))
+        try:
+            rows = dict(con.execute("SELECT fqname, coalesce(summary_error, summary) FROM entities").fetchall())
+        finally:
+            con.close()
+        self.assertEqual("backend down", rows["pkg.mod.f3"])
+        for i in (0, 1, 2, 4, 5):
+            self.assertTrue(rows[f"pkg.mod.f{i}"].startswith(f"Purpose: pkg.mod.f{i}"))
+
+    def test_run_summarize_records_missing_source_file_and_continues(self) -> None:
+        """An entity whose file is gone gets a summary_error; the rest of the run is still written."""
+        con = sqlite3.connect(str(self.db))
+        with con:
+            con.execute("UPDATE entities SET file = 'pkg/gone.py' WHERE fqname = 'pkg.mod.f2'")
+        con.close()
+
+        def fake_routed(**kw: object) -> dict[str, object]:
+            return {
+                "summary": f"Purpose: {kw['fqname']}\nCoverage: full",
+                "was_truncated": False,
+                "approx_tokens": 10,
+                "coverage": "full",
+                "backend": "codex",
+            }
+
+        with patch.dict(os.environ, {"CONTEXT6_CONCURRENCY": "2", "CONTEXT6_SOURCE_ROOT": str(self.src)}), \
+                patch.object(s, "summarize_entity_routed", side_effect=fake_routed) as routed, \
+                patch("builtins.print"):
+            n = s.run_summarize(self.db, limit=10)
+
+        self.assertEqual(6, n)
+        self.assertEqual(5, routed.call_count)
+        con = sqlite3.connect(str(self.db))
+        try:
+            rows = {r[0]: r[1:] for r in con.execute("SELECT fqname, summary, summary_hash, summary_error FROM entities")}
+        finally:
+            con.close()
+        summary, summary_hash, error = rows["pkg.mod.f2"]
+        self.assertEqual(("", None), (summary, summary_hash))
+        self.assertIn("Cannot read snippet", error)
+        for i in (0, 1, 3, 4, 5):
+            self.assertTrue(rows[f"pkg.mod.f{i}"][0].startswith(f"Purpose: pkg.mod.f{i}"))
+
+    def test_run_summarize_codex_stores_partial_summaries_for_tiny_code(self) -> None:
+        """Tiny entities get a stored signature-only summary (coverage 'partial'), so each run moves on."""
+        from context6.core import codex_summarizer
+
+        with patch.dict(os.environ, {"CONTEXT6_SOURCE_ROOT": str(self.src)}), \
+                patch.object(codex_summarizer.subprocess, "run") as run, \
+                patch("builtins.print"):
+            first = s.run_summarize(self.db, limit=4, summarizer="codex")
+            second = s.run_summarize(self.db, limit=4, summarizer="codex")
+
+        self.assertEqual((4, 2), (first, second))
+        run.assert_not_called()
+        self.assertEqual([], s.get_entities_needing_summary(self.db, limit=10))
+        con = sqlite3.connect(str(self.db))
+        try:
+            rows = con.execute("SELECT fqname, summary, summary_hash, code_hash, summary_coverage FROM entities").fetchall()
+        finally:
+            con.close()
+        for fqname, summary, summary_hash, code_hash, coverage in rows:
+            self.assertEqual(f"Purpose: {fqname.rsplit('.', 1)[1]}()\nCoverage: partial", summary)
+            self.assertEqual((code_hash, "partial"), (summary_hash, coverage))
+
+    def test_run_summarize_without_source_root_does_not_commit(self) -> None:
+        """Without a source root no entity is summarized, written or committed."""
+        con = s.get_conn(self.db)
+        with patch.dict(os.environ, {"CONTEXT6_SOURCE_ROOT": ""}), \
+                patch.object(s, "get_conn", return_value=Mock(wraps=con)) as get_conn, \
+                patch.object(s, "summarize_entity_routed") as routed, \
+                patch("builtins.print"):
+            n = s.run_summarize(self.db, limit=10)
+
+        self.assertEqual(0, n)
+        routed.assert_not_called()
+        get_conn.return_value.commit.assert_not_called()
+
+
+class TestSummarizeRouter(unittest.TestCase):
+    """Tests for backend routing in auto mode."""
+
+    def _route(self, code: str) -> tuple[dict[str, object], bool, bool]:
+        ollama_out = {"summary": "Purpose: x\nCoverage: full", "was_truncated": False, "approx_tokens": 1, "coverage": "full"}
+        codex_out = dict(ollama_out)
+        with patch.object(router, "summarize_entity_ollama", return_value=dict(ollama_out)) as ollama, \
+                patch.object(router, "summmarize_entity_codex", return_value=dict(codex_out)) as codex:
+            res = router.summarize_entity_routed("function", "pkg.f", "f()", "", code, mode="auto")
+        return res, ollama.called, codex.called
+
+    def test_auto_uses_ollama_when_code_fits(self) -> None:
+        res, ollama_called, codex_called = self._route("def f():\n    return 1\n")
+        self.assertEqual("ollama", res["backend"])
+        self.assertTrue(ollama_called)
+        self.assertFalse(codex_called)
+
+    def test_auto_sends_oversized_code_straight_to_codex(self) -> None:
+        res, ollama_called, codex_called = self._route("x = 1\n" * 10000)
+        self.assertEqual("codex", res["backend"])
+        self.assertFalse(ollama_called)
+        self.assertTrue(codex_called)
+
+
+if __name__ == "__main__":
+    unittest.main()